@@ -1,24 +1,39 @@
 import streamlit as st
-import ccxt
-import pandas as pd
 import numpy as np
-import plotly.graph_objs as go
-from plotly.subplots import make_subplots # 引入子圖功能
-import time
+import pandas as pd
+from collections import deque
 from datetime import datetime, timedelta
+from itertools import islice
+from backtest import (MAX_POINTS, SOURCES, LiveStrategy, OHLCVStore, PollingFeed, ReplayFeed, base_range, build_price_volume_figure,
+                      build_sweep_heatmap, can_resample, compact_candles, date_range_ms, execution_costs, export_bundle, get_exchange,
+                      infer_timeframe, load_ohlcv, memory_usage, performance_metrics, periods_per_year, read_ohlcv, run_portfolio,
+                      run_strategy_cached, run_strategy_compact, select_resampled, start_profiling, strategy_rules, sweep, walk_forward)
+from backtest import profiling
 
 # --- 頁面設定 ---
 st.set_page_config(page_title="全能回測 (含成交量)", layout="wide")
 st.title("🚀 全能策略回測系統 (含量價分析)")
 
+# K 線週期由細到粗；本地聚合模式只下載最細的那個
+TIMEFRAMES = ["15m", "1h", "4h", "1d", "1w"]
+
+# 進階績效指標的顯示名稱與格式 (總覽、參數掃描、組合回測共用)
+METRIC_NAMES = {"dd_duration": "最長回撤 (K 棒數)", "sharpe": "Sharpe (年化)", "sortino": "Sortino (年化)", "calmar": "Calmar", "win_rate": "勝率 (%)", "profit_factor": "獲利因子", "exposure": "持倉比例 (%)"}
+METRIC_FORMATS = {name: "{:.0f}" if key == "dd_duration" else "{:.2f}" for key, name in METRIC_NAMES.items()}
+
 # --- 1. 側邊欄設定 ---
 st.sidebar.header("1. 數據設定")
+data_source = st.sidebar.radio("數據來源", ["交易所", "本地檔案"], horizontal=True)
+if data_source == "本地檔案":
+    uploaded_file = st.sidebar.file_uploader("K 線檔 (Parquet / Arrow / Feather / CSV)", type=["parquet", "arrow", "feather", "ipc", "csv", "gz"])
+    store_exchange = st.sidebar.selectbox("寫入本地倉庫 (之後選交易所來源時離線可用)", ["不寫入"] + [name for name, _ in SOURCES])
 common_pairs = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'BTC/USD', 'ETH/USD', 'DOGE/USDT', 'XRP/USDT']
 selected_symbol = st.sidebar.selectbox("交易對", common_pairs)
 custom_symbol = st.sidebar.text_input("自定義 (如 BNB/USDT)", "").upper()
 if custom_symbol: selected_symbol = custom_symbol
 
-timeframe = st.sidebar.selectbox("K線週期", ["15m", "1h", "4h", "1d", "1w"], index=3)
+timeframe = st.sidebar.selectbox("K線週期", TIMEFRAMES, index=3)
+local_resample = st.sidebar.checkbox(f"只下載 {TIMEFRAMES[0]}，其餘週期在本地聚合 (切換週期不需重新下載)", value=True)
 
 st.sidebar.markdown("### 選擇日期範圍")
 default_start = datetime.now() - timedelta(days=365)
@@ -28,6 +43,7 @@ start_date = col_d1.date_input("開始日期", default_start)
 end_date = col_d2.date_input("結束日期", default_end)
 
 initial_capital = st.sidebar.number_input("初始本金 (USDT)", value=10000)
+compact_mode = st.sidebar.checkbox("精簡記憶體模式 (float32 K 線、策略不複製資料)", value=False)
 
 st.sidebar.markdown("---")
 
@@ -49,139 +65,187 @@ st.sidebar.markdown("---")
 st.sidebar.subheader("📊 成交量設定")
 vol_ma_len = st.sidebar.number_input("成交量均線週期 (Vol MA)", value=20)
 
-# --- 核心函數：分批抓取數據 (抗封鎖版) ---
+st.sidebar.markdown("---")
+# --- 進出場條件 (策略 A/B 共用；全部為 0 時即單純均線交叉；即時模式不套用) ---
+st.sidebar.subheader("🎯 進出場條件")
+volume_k = st.sidebar.number_input("進場需成交量 > k × Vol MA (k，0 為不過濾)", value=0.0, min_value=0.0, step=0.1)
+col_r1, col_r2, col_r3 = st.sidebar.columns(3)
+stop_loss = col_r1.number_input("停損 (%)", value=0.0, min_value=0.0, step=0.5)
+take_profit = col_r2.number_input("停利 (%)", value=0.0, min_value=0.0, step=0.5)
+trailing = col_r3.number_input("移動停損 (%)", value=0.0, min_value=0.0, step=0.5)
+rules = {"volume_k": volume_k, "stop_loss": stop_loss / 100, "take_profit": take_profit / 100, "trailing": trailing / 100}
+
+st.sidebar.markdown("---")
+# --- 交易成本設定 (策略 A/B、參數掃描、滾動前進、組合回測共用；即時模式不計成本) ---
+st.sidebar.subheader("💸 交易成本")
+order_type = st.sidebar.radio("下單方式", ["市價 (Taker)", "限價 (Maker)"], horizontal=True)
+col_f1, col_f2 = st.sidebar.columns(2)
+taker_fee = col_f1.number_input("Taker 手續費 (%)", value=0.0, min_value=0.0, step=0.01, format="%.3f")
+maker_fee = col_f2.number_input("Maker 手續費 (%)", value=0.0, min_value=0.0, step=0.01, format="%.3f")
+slippage_bps = st.sidebar.number_input("滑價 (bps，僅市價單)", value=0.0, min_value=0.0, step=1.0)
+position_size = st.sidebar.slider("每次進場投入資金 (%)", min_value=1, max_value=100, value=100)
+next_open = st.sidebar.checkbox("訊號於下一根 K 棒開盤成交", value=False)
+fee_sweep = st.sidebar.checkbox("參數掃描同時比較多種手續費", value=False)
+# 限價單以掛單價成交，不計滑價
+costs = {"fee": (taker_fee if order_type.startswith("市價") else maker_fee) / 100, "slippage_bps": slippage_bps if order_type.startswith("市價") else 0.0, "size": position_size / 100, "next_open": next_open}
+
+st.sidebar.markdown("---")
+# --- 參數掃描設定 ---
+st.sidebar.subheader("🧪 參數掃描")
+sweep_enabled = st.sidebar.checkbox("啟用參數掃描", value=False)
+walk_enabled = st.sidebar.checkbox("啟用滾動前進最佳化 (Walk-forward，使用相同參數範圍)", value=False)
+if walk_enabled:
+    col_w1, col_w2 = st.sidebar.columns(2)
+    walk_train = col_w1.number_input("訓練 K 棒數", value=500, min_value=10)
+    walk_test = col_w2.number_input("測試 K 棒數", value=100, min_value=1)
+    walk_anchored = st.sidebar.checkbox("擴張訓練視窗 (從頭開始)", value=False)
+if sweep_enabled or walk_enabled:
+    sweep_types = st.sidebar.multiselect("掃描種類", ma_options, default=ma_options)
+    col_s1, col_s2, col_s3 = st.sidebar.columns(3)
+    sweep_short = range(col_s1.number_input("短 起", value=3, min_value=1), col_s2.number_input("短 迄", value=30, min_value=1) + 1, col_s3.number_input("短 步長", value=1, min_value=1))
+    col_l1, col_l2, col_l3 = st.sidebar.columns(3)
+    sweep_long = range(col_l1.number_input("長 起", value=10, min_value=1), col_l2.number_input("長 迄", value=120, min_value=1) + 1, col_l3.number_input("長 步長", value=5, min_value=1))
+
+st.sidebar.markdown("---")
+# --- 多交易對組合回測設定 ---
+st.sidebar.subheader("🗂️ 組合回測")
+portfolio_enabled = st.sidebar.checkbox("啟用組合回測 (策略 A/B 套用到多個交易對與週期)", value=False)
+if portfolio_enabled:
+    portfolio_symbols = st.sidebar.multiselect("組合交易對", common_pairs, default=common_pairs[:3])
+    portfolio_timeframes = st.sidebar.multiselect("組合週期", TIMEFRAMES, default=[timeframe])
+
+st.sidebar.markdown("---")
+# --- 即時模式設定 ---
+st.sidebar.subheader("📡 即時模式")
+live_enabled = st.sidebar.checkbox("啟用即時更新 (策略 A)", value=False)
+if live_enabled:
+    # 本地檔案沒有對應的交易所可輪詢，只能回放
+    live_feed = st.sidebar.radio("資料來源", ["交易所輪詢", "歷史回放"] if data_source == "交易所" else ["歷史回放"], horizontal=True)
+    if live_feed == "交易所輪詢":
+        poll_seconds = st.sidebar.number_input("輪詢間隔 (秒)", value=15, min_value=1)
+    else:
+        replay_speed = st.sidebar.number_input("每秒回放 K 棒數", value=5, min_value=1)
+
+st.sidebar.markdown("---")
+# --- 效能分析設定 ---
+st.sidebar.subheader("⏱️ 效能分析")
+perf_enabled = st.sidebar.checkbox("記錄本次執行的各階段耗時", value=False)
+if perf_enabled:
+    perf_mode = st.sidebar.radio("完整呼叫堆疊", ["不錄製", "cProfile", "pyinstrument"], horizontal=True)
+
+# 每次 rerun 都重新開始 (未啟用時清除上次的 Profiler，各階段的計時只剩一次查詢)
+try:
+    perf = start_profiling(perf_enabled, {"cProfile": "cprofile", "pyinstrument": "pyinstrument"}.get(perf_mode) if perf_enabled else None)
+except ImportError:
+    st.sidebar.warning("未安裝 pyinstrument，改為只記錄各階段耗時")
+    perf = start_profiling(True)
+
+# --- 核心函數：分批抓取數據 (抗封鎖版，本地倉庫只補抓缺口) ---
+# 倉庫物件由所有工作階段共用 (寫入鎖本身是模組層級、依目錄區分)
+@st.cache_resource
+def get_ohlcv_store():
+    return OHLCVStore()
+
+ohlcv_store = get_ohlcv_store()
+
 @st.cache_data(ttl=3600)
-def get_data_by_date_range(symbol, timeframe, start_date, end_date):
-    exchanges_list = [('Binance', ccxt.binance()), ('Binance US', ccxt.binanceus()), ('Kraken', ccxt.kraken())]
+def get_data_by_date_range(symbol, timeframe, start_date, end_date, span_timeframe=None):
+    # span_timeframe：下載區間尾端延伸到該週期 K 棒結束，讓由此聚合出的所有週期最後一根都完整
     progress_bar = st.progress(0)
     status_text = st.empty()
-    
-    for exchange_name, exchange in exchanges_list:
-        try:
-            if not exchange.fetch_ohlcv(symbol, timeframe, limit=1): continue 
-            status_text.text(f"正在從 {exchange_name} 下載數據...")
-            since = exchange.parse8601(f"{start_date}T00:00:00Z")
-            end_timestamp = exchange.parse8601(f"{end_date}T23:59:59Z")
-            all_ohlcv = []
-            limit = 1000 
-            
-            while since < end_timestamp:
-                ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
-                if not ohlcv: break
-                all_ohlcv += ohlcv
-                last_timestamp = ohlcv[-1][0]
-                if last_timestamp >= end_timestamp: break
-                since = last_timestamp + 1 
-                total = end_timestamp - exchange.parse8601(f"{start_date}T00:00:00Z")
-                curr = last_timestamp - exchange.parse8601(f"{start_date}T00:00:00Z")
-                progress_bar.progress(min(curr / total, 1.0))
-                time.sleep(exchange.rateLimit / 1000 if exchange.rateLimit else 0.1)
-
-            if not all_ohlcv: continue
-            df = pd.DataFrame(all_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            mask = (df['timestamp'] >= pd.to_datetime(start_date)) & (df['timestamp'] <= pd.to_datetime(end_date) + timedelta(days=1))
-            df = df.loc[mask]
-            progress_bar.progress(1.0)
-            status_text.empty()
-            return df, exchange_name
-        except: continue
-    progress_bar.empty()
-    return None, "Fail"
-
-# --- 數學指標計算函數 ---
-def calculate_wma(series, window):
-    weights = np.arange(1, window + 1)
-    return series.rolling(window).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
-
-def calculate_hma(series, window):
-    half_window = int(window / 2)
-    sqrt_window = int(np.sqrt(window))
-    wma_half = calculate_wma(series, half_window)
-    wma_full = calculate_wma(series, window)
-    raw_hma = 2 * wma_half - wma_full
-    return calculate_wma(raw_hma, sqrt_window)
-
-def calculate_ma(series, window, ma_type):
-    if "EMA" in ma_type: return series.ewm(span=window, adjust=False).mean()
-    elif "HMA" in ma_type: return calculate_hma(series, window)
-    else: return series.rolling(window).mean()
-
-def calculate_mdd(equity_series):
-    running_max = equity_series.cummax()
-    drawdown = (equity_series - running_max) / running_max
-    return drawdown.min() * 100 
-
-def run_strategy(df_input, short_w, long_w, ma_type, capital, vol_ma_len):
-    df = df_input.copy()
-    col_s, col_l = f'MA_{short_w}', f'MA_{long_w}'
-    
-    # 1. 計算價格均線
-    df[col_s] = calculate_ma(df['close'], short_w, ma_type)
-    df[col_l] = calculate_ma(df['close'], long_w, ma_type)
-    
-    # 2. 計算成交量均線 (固定使用 SMA)
-    df['Vol_MA'] = df['volume'].rolling(window=vol_ma_len).mean()
-    
-    # 3. 策略訊號
-    df['Signal'] = 0
-    df.loc[(df[col_s] > df[col_l]) & (df[col_s].shift(1) <= df[col_l].shift(1)), 'Signal'] = 1
-    df.loc[(df[col_s] < df[col_l]) & (df[col_s].shift(1) >= df[col_l].shift(1)), 'Signal'] = -1
-    
-    balance = capital
-    position = 0
-    equity = []
-    trades = 0
-    trade_log = [] 
-    current_entry_price = 0
-    current_entry_time = None
-    buy_signals = []
-    sell_signals = []
-    
-    for i, row in df.iterrows():
-        price = row['close']
-        time = row['timestamp']
-        if row['Signal'] == 1 and position == 0:
-            position = balance / price
-            balance = 0
-            trades += 1
-            current_entry_price = price
-            current_entry_time = time
-            buy_signals.append((time, price))
-        elif row['Signal'] == -1 and position > 0:
-            balance = position * price
-            position = 0
-            trades += 1
-            sell_signals.append((time, price))
-            pnl = (price - current_entry_price) / current_entry_price * 100
-            trade_log.append({"買入時間": current_entry_time, "買入價格": current_entry_price, "賣出時間": time, "賣出價格": price, "單筆獲利 (%)": pnl})
-        equity.append(balance + (position * price))
-        
-    df['Equity'] = equity
-    final_equity = equity[-1]
-    roi = ((final_equity - capital) / capital) * 100
-    mdd = calculate_mdd(pd.Series(equity))
-    return {"final_equity": final_equity, "roi": roi, "trades": trades, "mdd": mdd, "df": df, "buys": buy_signals, "sells": sell_signals, "trade_log": pd.DataFrame(trade_log)}
+    since, end_timestamp = date_range_ms(start_date, end_date)
+    if span_timeframe: since, end_timestamp = base_range(since, end_timestamp, span_timeframe)
+    df, source = load_ohlcv(symbol, timeframe, since, end_timestamp, ohlcv_store, on_status=status_text.text, on_progress=progress_bar.progress)
+    if df is None:
+        progress_bar.empty()
+        return None, source
+    progress_bar.progress(1.0)
+    status_text.empty()
+    return df, source
+
+# 上傳的檔案以 file_id 為鍵只解析一次；cache_resource 回傳同一物件 (不像 cache_data 每次複製)，呼叫端不可修改
+@st.cache_resource(max_entries=4)
+def load_uploaded_file(file_id, _file):
+    df = read_ohlcv(_file)
+    return df, infer_timeframe(df)
+
+@st.cache_resource(max_entries=16)
+def store_uploaded_file(file_id, exchange_id, symbol, timeframe, _df):
+    ohlcv_store.ingest(exchange_id, symbol, timeframe, _df)
+    return True
+
+def candle_frame():
+    # 精簡模式沒有保留 float64 K 線，需要完整 DataFrame 時才由 CompactCandles 還原 (用完即釋放)
+    return candles.frame() if compact_mode else raw_data
+
+def strategy_frame(res):
+    # 精簡模式沒有完整 DataFrame，匯出時才組出來
+    return res['df'] if 'df' in res else res['view'].frame()
 
 # --- 主程式執行 ---
 
 if start_date > end_date:
     st.error("❌ 日期設定錯誤")
 else:
-    st.write(f"正在下載 **{selected_symbol}** 數據...")
-    raw_data, source = get_data_by_date_range(selected_symbol, timeframe, start_date, end_date)
+    st.write(f"正在{'讀取' if data_source == '本地檔案' else '下載'} **{selected_symbol}** 數據...")
+    with profiling.timer('load_data'):
+        if data_source == "本地檔案":
+            raw_data, source = None, "本地檔案"
+            if uploaded_file is None:
+                st.info("請在側邊欄上傳 K 線檔")
+            else:
+                try:
+                    file_data, file_timeframe = load_uploaded_file(uploaded_file.file_id, uploaded_file)
+                except (ImportError, ValueError) as e:
+                    st.error(f"❌ 無法讀取 {uploaded_file.name}: {e}")
+                    file_data, file_timeframe = None, None
+                if file_data is not None and file_timeframe is None:
+                    st.error("❌ 檔案少於兩根 K 棒，無法判斷週期")
+                elif file_data is not None:
+                    source = f"本地檔案 {uploaded_file.name} ({file_timeframe})"
+                    if store_exchange != "不寫入":
+                        store_uploaded_file(uploaded_file.file_id, dict(SOURCES)[store_exchange], selected_symbol, file_timeframe, file_data)
+                    since, until = date_range_ms(start_date, end_date)
+                    if file_timeframe == timeframe:
+                        ts = file_data['timestamp']
+                        raw_data = file_data[(ts >= pd.Timestamp(since, unit='ms')) & (ts <= pd.Timestamp(until, unit='ms'))].reset_index(drop=True)
+                    elif can_resample(file_timeframe, timeframe):
+                        raw_data = select_resampled(file_data, timeframe, since, until)
+                    else:
+                        st.error(f"❌ 檔案週期為 {file_timeframe}，無法聚合成 {timeframe}")
+        elif local_resample and can_resample(TIMEFRAMES[0], timeframe):
+            # 基礎 K 線的快取與週期無關，切換週期只做本地聚合
+            base_data, source = get_data_by_date_range(selected_symbol, TIMEFRAMES[0], start_date, end_date, TIMEFRAMES[-1])
+            raw_data = select_resampled(base_data, timeframe, *date_range_ms(start_date, end_date)) if base_data is not None else None
+        else:
+            raw_data, source = get_data_by_date_range(selected_symbol, timeframe, start_date, end_date)
+
+    has_data = raw_data is not None and not raw_data.empty
+    if has_data:
+        st.success(f"✅ {'載入' if data_source == '本地檔案' else '下載'}完成 (來源: {source}) | 共 {len(raw_data)} 根 K 棒")
+        if compact_mode:
+            candles = compact_candles(raw_data)
+            # 精簡模式不保留 float64 K 線：B&H 與顯示區間直接讀 candles，匯出、掃描與即時模式暖機才暫時還原
+            raw_data = None
 
-    if raw_data is not None and not raw_data.empty:
-        st.success(f"✅ 下載完成 (來源: {source}) | 共 {len(raw_data)} 根 K 棒")
-        
         # 基準
-        bh_equity = initial_capital * (raw_data['close'] / raw_data['close'].iloc[0])
-        bh_roi = ((bh_equity.iloc[-1] - initial_capital) / initial_capital) * 100
-        bh_mdd = calculate_mdd(bh_equity)
+        close = candles.column('close') if compact_mode else raw_data['close'].to_numpy()
+        bh_equity = initial_capital * (close / close[0])
+        bh_roi = ((bh_equity[-1] - initial_capital) / initial_capital) * 100
+        bh_metrics = performance_metrics(bh_equity, np.ones(len(bh_equity), dtype=bool), periods_per_year(candles.timestamp if compact_mode else raw_data['timestamp']), initial_capital)
+        bh_mdd = bh_metrics['mdd']
+        # 暫時陣列不留在腳本的全域命名空間 (即時模式的 fragment 會持續參照它)
+        del close, bh_equity
 
         # 執行策略
-        res_a = run_strategy(raw_data, short_a, long_a, ma_type_a, initial_capital, vol_ma_len)
-        res_b = run_strategy(raw_data, short_b, long_b, ma_type_b, initial_capital, vol_ma_len)
+        if compact_mode:
+            res_a = run_strategy_compact(candles, short_a, long_a, ma_type_a, initial_capital, vol_ma_len, costs, rules)
+            res_b = run_strategy_compact(candles, short_b, long_b, ma_type_b, initial_capital, vol_ma_len, costs, rules)
+            st.caption(f"💾 本次工作階段記憶體：{memory_usage(candles, res_a, res_b) / 1024 ** 2:.1f} MB (精簡模式)")
+        else:
+            res_a = run_strategy_cached(raw_data, short_a, long_a, ma_type_a, initial_capital, vol_ma_len, costs, rules)
+            res_b = run_strategy_cached(raw_data, short_b, long_b, ma_type_b, initial_capital, vol_ma_len, costs, rules)
+            st.caption(f"💾 本次工作階段記憶體：{memory_usage(raw_data, res_a, res_b) / 1024 ** 2:.1f} MB")
         
         # 看板
         st.subheader("🏆 策略績效總覽")
@@ -199,6 +263,12 @@ else:
             st.metric("ROI", f"{bh_roi:.2f}%")
             st.metric("MDD", f"{bh_mdd:.2f}%")
 
+        # 進階指標 (與 MDD 同一次計算產生，不另外重算)
+        with st.expander("📐 進階績效指標"):
+            metric_names = {"mdd": "MDD (%)", **METRIC_NAMES}
+            metric_table = pd.DataFrame({f"策略 A: {ma_type_a} ({short_a}/{long_a})": [res_a[k] for k in metric_names], f"策略 B: {ma_type_b} ({short_b}/{long_b})": [res_b[k] for k in metric_names], "Buy & Hold": [bh_metrics[k] for k in metric_names]}, index=list(metric_names.values()))
+            st.dataframe(metric_table.style.format("{:.2f}", na_rep="-"), use_container_width=True)
+
         # --- 詳細分析 (含成交量圖) ---
         st.markdown("---")
         st.subheader("🔎 詳細進出場與成交量分析")
@@ -210,43 +280,163 @@ else:
         tab1, tab2 = st.tabs(["📈 K 線與成交量圖", "📋 交易明細表"])
 
         with tab1:
-            df = target_res['df']
-            # 建立子圖 (2列 1行, 共享X軸, 上圖高下圖矮)
-            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, 
-                                vertical_spacing=0.03, subplot_titles=(f'{selected_symbol} 價格走勢', '成交量'),
-                                row_heights=[0.7, 0.3])
-
-            # 1. 上圖：K線與價格均線
-            fig.add_trace(go.Candlestick(x=df['timestamp'], open=df['open'], high=df['high'], low=df['low'], close=df['close'], name='價格'), row=1, col=1)
-            fig.add_trace(go.Scatter(x=df['timestamp'], y=df[f'MA_{target_short}'], line=dict(color='orange', width=1), name=f'MA {target_short}'), row=1, col=1)
-            fig.add_trace(go.Scatter(x=df['timestamp'], y=df[f'MA_{target_long}'], line=dict(color='blue', width=1), name=f'MA {target_long}'), row=1, col=1)
-            
-            # 買賣點標記
-            if target_res['buys']:
-                bx, by = zip(*target_res['buys'])
-                fig.add_trace(go.Scatter(x=bx, y=by, mode='markers', name='買進', marker=dict(symbol='triangle-up', size=15, color='#00CC96')), row=1, col=1)
-            if target_res['sells']:
-                sx, sy = zip(*target_res['sells'])
-                fig.add_trace(go.Scatter(x=sx, y=sy, mode='markers', name='賣出', marker=dict(symbol='triangle-down', size=15, color='#EF553B')), row=1, col=1)
-
-            # 2. 下圖：成交量與 Vol MA
-            # 設定顏色：收盤 >= 開盤 為綠色，否則為紅色
-            vol_colors = ['#00CC96' if c >= o else '#EF553B' for c, o in zip(df['close'], df['open'])]
-            
-            fig.add_trace(go.Bar(x=df['timestamp'], y=df['volume'], marker_color=vol_colors, name='成交量'), row=2, col=1)
-            
-            # 成交量均線 (白色線條)
-            fig.add_trace(go.Scatter(x=df['timestamp'], y=df['Vol_MA'], line=dict(color='white', width=1.5), name=f'Vol MA {vol_ma_len}'), row=2, col=1)
-
-            # 移除下方的 Range Slider
-            fig.update_layout(template='plotly_dark', height=700, xaxis_rangeslider_visible=False)
-            st.plotly_chart(fig, use_container_width=True)
+            view = target_res.get('view')
+            edges = pd.to_datetime(candles.timestamp[[0, -1]], unit='ms') if compact_mode else raw_data['timestamp'].iloc[[0, -1]]
+            # 顯示區間：縮小區間時以較細粒度重新聚合，送到瀏覽器的點數固定 (約 1500 根)
+            view_start, view_end = t_first, t_last = [t.to_pydatetime() for t in edges]
+            if t_first < t_last:
+                view_start, view_end = st.slider("顯示區間", min_value=t_first, max_value=t_last, value=(t_first, t_last), format="YYYY-MM-DD HH:mm")
+            if view is not None:
+                # 精簡模式只把選取區間組成 DataFrame
+                df = view.frame(*view.candles.time_range(view_start, view_end))
+            else:
+                df = target_res['df']
+                df = df[(df['timestamp'] >= view_start) & (df['timestamp'] <= view_end)]
+            if df.empty:
+                st.warning("此區間沒有 K 棒")
+            else:
+                if len(df) > MAX_POINTS:
+                    st.caption(f"區間內共 {len(df)} 根 K 棒，已聚合為約 {MAX_POINTS} 根顯示；縮小區間可看到原始 K 棒")
+                fig = build_price_volume_figure(df, target_res, selected_symbol, target_short, target_long, vol_ma_len)
+                # 圖表序列化 (轉成 JSON 送到瀏覽器) 在 st.plotly_chart 內進行
+                with profiling.timer('chart:render'):
+                    st.plotly_chart(fig, use_container_width=True)
 
         with tab2:
             if not target_res['trade_log'].empty:
-                styled_df = target_res['trade_log'].style.format({"買入價格": "${:.2f}", "賣出價格": "${:.2f}", "單筆獲利 (%)": "{:.2f}%"}).applymap(lambda v: 'color: green' if v > 0 else 'color: red', subset=['單筆獲利 (%)'])
+                styled_df = target_res['trade_log'].style.format({"買入價格": "${:.2f}", "賣出價格": "${:.2f}", "單筆獲利 (%)": "{:.2f}%"}).map(lambda v: 'color: green' if v > 0 else 'color: red', subset=['單筆獲利 (%)'])
                 st.dataframe(styled_df, use_container_width=True)
             else:
                 st.warning("無交易紀錄")
-    else:
-        st.error("無法獲取數據")
+
+        # --- 批次匯出 (K 線、策略指標與權益、交易明細) ---
+        with st.expander("📦 批次匯出"):
+            export_fmt = st.radio("格式", ["parquet", "arrow", "csv"], horizontal=True, help="Parquet 體積最小；Arrow 可用 memory map 直接讀回，幾乎不需複製")
+            if st.checkbox("產生匯出檔", value=False):
+                frames = {"candles": candle_frame(), "strategy_a": strategy_frame(res_a), "strategy_b": strategy_frame(res_b), "trades_a": res_a['trade_log'], "trades_b": res_b['trade_log']}
+                try:
+                    bundle = export_bundle(frames, export_fmt)
+                    st.download_button("下載 zip", bundle, file_name=f"{selected_symbol.replace('/', '-')}_{timeframe}_{export_fmt}.zip", mime="application/zip")
+                except ImportError as e:
+                    st.error(str(e))
+
+        # --- 參數掃描 (每條均線只算一次，所有組合批次回測) ---
+        if sweep_enabled and sweep_types:
+            st.markdown("---")
+            st.subheader("🧪 參數掃描結果")
+            # 多種手續費共用同一份交叉與持倉狀態，每多一個費率只多一次權益計算
+            fee_levels = sorted({0.0, 0.0002, 0.0005, 0.001, 0.002, costs['fee']}) if fee_sweep else None
+            sweep_res = sweep(candle_frame(), sweep_types, sweep_short, sweep_long, initial_capital, costs, fee_levels)
+            if sweep_res.empty:
+                st.warning("沒有符合 短 < 長 的參數組合")
+            else:
+                st.caption(f"共 {len(sweep_res)} 組參數")
+                if fee_sweep:
+                    best_by_fee = sweep_res.groupby('fee')['roi'].agg(['max', 'median']).rename(columns={"max": "最佳 ROI (%)", "median": "ROI 中位數 (%)"})
+                    best_by_fee.index = [f"{fee * 100:.2f}%" for fee in best_by_fee.index]
+                    st.dataframe(best_by_fee.T.style.format("{:.2f}"), use_container_width=True)
+                    sweep_res = sweep_res[sweep_res['fee'] == costs['fee']].drop(columns='fee')
+                heat_type = st.radio("熱力圖種類", sweep_types, horizontal=True)
+                st.plotly_chart(build_sweep_heatmap(sweep_res, heat_type, zmid=bh_roi), use_container_width=True)
+                table = sweep_res.sort_values('roi', ascending=False).rename(columns={"ma_type": "種類", "short": "短", "long": "長", "final_equity": "最終權益", "roi": "ROI (%)", "mdd": "MDD (%)", "trades": "交易次數", **METRIC_NAMES})
+                st.dataframe(table.style.format({"最終權益": "${:.2f}", "ROI (%)": "{:.2f}%", "MDD (%)": "{:.2f}%", **METRIC_FORMATS}, na_rep="-"), use_container_width=True, hide_index=True)
+
+        # --- 滾動前進最佳化 (訓練視窗選參數、測試視窗樣本外驗證；均線與交叉訊號全序列只算一次) ---
+        if walk_enabled and sweep_types:
+            st.markdown("---")
+            st.subheader("🚶 滾動前進最佳化 (樣本外)")
+            with profiling.timer('walk_forward'):
+                walk_res = walk_forward(candle_frame(), sweep_types, sweep_short, sweep_long, initial_capital, walk_train, walk_test, anchored=walk_anchored, costs=costs)
+            if walk_res is None and not any(s < l for s in sweep_short for l in sweep_long):
+                st.warning("沒有符合 短 < 長 的參數組合")
+            elif walk_res is None:
+                st.warning(f"K 棒數不足：至少需要 {walk_train + walk_test} 根")
+            else:
+                walk_cols = st.columns(3)
+                walk_cols[0].metric("樣本外 ROI", f"{walk_res['roi']:.2f}%", f"{walk_res['roi'] - walk_res['bh_roi']:.2f}% vs B&H")
+                walk_cols[1].metric("樣本外 MDD", f"{walk_res['mdd']:.2f}%")
+                walk_cols[2].metric("視窗數", len(walk_res['windows']))
+                st.line_chart(walk_res['equity'].set_index('timestamp').rename(columns={'Equity': '樣本外權益'}), height=300)
+                table = walk_res['windows'].rename(columns={"window": "視窗", "train_start": "訓練起", "train_end": "訓練迄", "test_start": "測試起", "test_end": "測試迄", "ma_type": "種類", "short": "短", "long": "長", "train_roi": "訓練 ROI (%)", "train_trades": "訓練交易次數", "test_roi": "測試 ROI (%)", "test_trades": "測試交易次數", "test_mdd": "測試 MDD (%)"})
+                st.dataframe(table.style.format({"訓練 ROI (%)": "{:.2f}%", "測試 ROI (%)": "{:.2f}%", "測試 MDD (%)": "{:.2f}%"}), use_container_width=True, hide_index=True)
+    elif data_source == "交易所":
+        st.error(f"無法獲取數據：{source}")
+    elif uploaded_file is not None and source != "本地檔案":
+        st.warning("檔案在所選日期範圍內沒有 K 棒")
+
+# --- 組合回測 (多行程平行，K 線經共享記憶體傳給工作行程) ---
+if portfolio_enabled and start_date <= end_date:
+    st.markdown("---")
+    st.subheader("🗂️ 組合回測排行")
+    if st.button("執行組合回測") and portfolio_symbols and portfolio_timeframes:
+        portfolio_progress = st.progress(0)
+        configs = [(ma_type_a, short_a, long_a), (ma_type_b, short_b, long_b)]
+        with profiling.timer('portfolio'):
+            st.session_state['portfolio_result'] = run_portfolio(portfolio_symbols, portfolio_timeframes, configs, start_date, end_date, initial_capital, store=ohlcv_store, on_progress=portfolio_progress.progress, base_timeframe=TIMEFRAMES[0] if local_resample else None, costs=costs)
+        portfolio_progress.empty()
+    if 'portfolio_result' in st.session_state:
+        table = st.session_state['portfolio_result'].rename(columns={"rank": "排名", "symbol": "交易對", "timeframe": "週期", "ma_type": "種類", "short": "短", "long": "長", "source": "來源", "bars": "K 棒數", "final_equity": "最終權益", "roi": "ROI (%)", "mdd": "MDD (%)", "trades": "交易次數", "bh_roi": "B&H ROI (%)", **METRIC_NAMES})
+        st.dataframe(table.style.format({"最終權益": "${:.2f}", "ROI (%)": "{:.2f}%", "MDD (%)": "{:.2f}%", "B&H ROI (%)": "{:.2f}%", **METRIC_FORMATS}, na_rep="-"), use_container_width=True, hide_index=True)
+
+# --- 即時模式 (fragment 定時只重跑本區塊；策略狀態存在 session_state，每根新 K 棒 O(1) 更新) ---
+if live_enabled and start_date <= end_date and has_data:
+    @st.fragment(run_every=poll_seconds if live_feed == "交易所輪詢" else 1)
+    def live_panel():
+        live_key = (selected_symbol, timeframe, start_date, end_date, ma_type_a, short_a, long_a, initial_capital, vol_ma_len, live_feed)
+        state = st.session_state.get('live')
+        if state is None or state['key'] != live_key:
+            data = candle_frame()
+            if live_feed == "歷史回放":
+                # 前半段暖機，後半段逐根回放
+                history = data.iloc[:len(data) // 2]
+                feed = iter(ReplayFeed(data.iloc[len(data) // 2:], timeframe))
+            else:
+                history = data
+                last_ms = history['timestamp'].iloc[-1].value // 1_000_000
+                feed = PollingFeed(get_exchange(dict(SOURCES)[source]), selected_symbol, timeframe, since=last_ms + 1, poll_seconds=poll_seconds)
+            seed_df = run_strategy_cached(history, short_a, long_a, ma_type_a, initial_capital, vol_ma_len)['df'].tail(300)
+            rows = deque(seed_df[['timestamp', 'close', f'MA_{short_a}', f'MA_{long_a}', 'Equity']].to_dict('records'), maxlen=300)
+            state = st.session_state['live'] = {"key": live_key, "feed": feed, "rows": rows, "strategy": LiveStrategy(short_a, long_a, ma_type_a, initial_capital, vol_ma_len).seed(history)}
+        live = state['strategy']
+        new_candles = state['feed'].poll() if live_feed == "交易所輪詢" else list(islice(state['feed'], replay_speed))
+        for candle in new_candles:
+            state['rows'].append(live.update(pd.Timestamp(candle[0], unit='ms'), candle[4], candle[5]))
+
+        st.subheader(f"📡 即時模式 ({ma_type_a} {short_a}/{long_a} 純均線交叉，未套用進出場條件與交易成本)")
+        if execution_costs(costs) != execution_costs() or any(strategy_rules(rules)):
+            st.caption("⚠️ 即時模式只依均線交叉、以收盤價全倉成交，不套用成交量過濾/停損/停利/移動停損，也不扣手續費與滑價，與上方策略 A 的績效不可直接比較")
+        live_cols = st.columns(3)
+        live_cols[0].metric("即時權益", f"{live.equity:,.2f}", f"{(live.equity - initial_capital) / initial_capital * 100:.2f}%")
+        live_cols[1].metric("交易次數", live.trades)
+        live_cols[2].metric("最新 K 棒", str(live.last_timestamp), f"+{len(new_candles)} 根")
+        # 圖表只保留最近 300 根，每次更新的傳輸量固定，不隨資料量成長
+        recent = pd.DataFrame(list(state['rows'])).set_index('timestamp')
+        st.line_chart(recent[['close', f'MA_{short_a}', f'MA_{long_a}']].rename(columns={'close': '價格'}), height=300)
+        st.line_chart(recent[['Equity']].rename(columns={'Equity': '權益'}), height=200)
+
+    st.markdown("---")
+    live_panel()
+
+# --- 效能分析面板 (即時模式的 fragment 另外重跑，不計入) ---
+if perf is not None:
+    perf.stop()
+    with st.expander("⏱️ 效能分析", expanded=True):
+        counters = perf.counters
+        perf_cols = st.columns(4)
+        perf_cols[0].metric("總耗時", f"{perf.elapsed:.3f} 秒")
+        perf_cols[1].metric("下載頁數", int(counters.get('pages', 0)), f"{counters.get('bytes_downloaded', 0) / 1024 ** 2:.2f} MB")
+        perf_cols[2].metric("限速等待 (各執行緒合計)", f"{counters.get('rate_limit_wait_seconds', 0):.2f} 秒")
+        perf_cols[3].metric("指標快取 命中/未命中", f"{int(counters.get('cache_hits', 0))} / {int(counters.get('cache_misses', 0))}")
+        stage_table = perf.report().rename(columns={"stage": "階段", "calls": "次數", "seconds": "秒數", "share": "佔比 (%)"})
+        st.dataframe(stage_table.style.format({"秒數": "{:.4f}", "佔比 (%)": "{:.1f}"}), use_container_width=True, hide_index=True)
+        throughput = perf.throughput()
+        if throughput:
+            st.caption("每秒處理 K 棒數：" + "、".join(f"{name} {rate:,.0f}" for name, rate in throughput.items()))
+        st.download_button("下載 JSON", perf.to_json(), file_name="profile.json", mime="application/json")
+        dump = perf.dump()
+        if dump is not None:
+            # cProfile 為 pstats 格式 (可用 snakeviz 等工具開啟)，pyinstrument 為 HTML
+            file_name = "profile.html" if perf.mode == 'pyinstrument' else "profile.prof"
+            st.download_button("下載完整呼叫堆疊", dump, file_name=file_name)
+        top_functions = perf.top_functions()
+        if top_functions: st.text(top_functions)
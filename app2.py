@@ -1,252 +0,0 @@
-import streamlit as st
-import ccxt
-import pandas as pd
-import numpy as np
-import plotly.graph_objs as go
-from plotly.subplots import make_subplots # 引入子圖功能
-import time
-from datetime import datetime, timedelta
-
-# --- 頁面設定 ---
-st.set_page_config(page_title="全能回測 (含成交量)", layout="wide")
-st.title("🚀 全能策略回測系統 (含量價分析)")
-
-# --- 1. 側邊欄設定 ---
-st.sidebar.header("1. 數據設定")
-common_pairs = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'BTC/USD', 'ETH/USD', 'DOGE/USDT', 'XRP/USDT']
-selected_symbol = st.sidebar.selectbox("交易對", common_pairs)
-custom_symbol = st.sidebar.text_input("自定義 (如 BNB/USDT)", "").upper()
-if custom_symbol: selected_symbol = custom_symbol
-
-timeframe = st.sidebar.selectbox("K線週期", ["15m", "1h", "4h", "1d", "1w"], index=3)
-
-st.sidebar.markdown("### 選擇日期範圍")
-default_start = datetime.now() - timedelta(days=365)
-default_end = datetime.now()
-col_d1, col_d2 = st.sidebar.columns(2)
-start_date = col_d1.date_input("開始日期", default_start)
-end_date = col_d2.date_input("結束日期", default_end)
-
-initial_capital = st.sidebar.number_input("初始本金 (USDT)", value=10000)
-
-st.sidebar.markdown("---")
-
-# --- 2. 策略設定 ---
-ma_options = ["SMA (簡單)", "EMA (指數)", "HMA (赫爾)"]
-
-st.sidebar.subheader("🔵 策略 A")
-ma_type_a = st.sidebar.selectbox("種類 A", ma_options, key='type_a', index=1)
-short_a = st.sidebar.number_input("短 A", value=5, key='short_a')
-long_a = st.sidebar.number_input("長 A", value=20, key='long_a')
-
-st.sidebar.subheader("🟠 策略 B")
-ma_type_b = st.sidebar.selectbox("種類 B", ma_options, key='type_b', index=2)
-short_b = st.sidebar.number_input("短 B", value=10, key='short_b')
-long_b = st.sidebar.number_input("長 B", value=60, key='long_b')
-
-st.sidebar.markdown("---")
-# --- 新增：成交量設定 ---
-st.sidebar.subheader("📊 成交量設定")
-vol_ma_len = st.sidebar.number_input("成交量均線週期 (Vol MA)", value=20)
-
-# --- 核心函數：分批抓取數據 (抗封鎖版) ---
-@st.cache_data(ttl=3600)
-def get_data_by_date_range(symbol, timeframe, start_date, end_date):
-    exchanges_list = [('Binance', ccxt.binance()), ('Binance US', ccxt.binanceus()), ('Kraken', ccxt.kraken())]
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    for exchange_name, exchange in exchanges_list:
-        try:
-            if not exchange.fetch_ohlcv(symbol, timeframe, limit=1): continue 
-            status_text.text(f"正在從 {exchange_name} 下載數據...")
-            since = exchange.parse8601(f"{start_date}T00:00:00Z")
-            end_timestamp = exchange.parse8601(f"{end_date}T23:59:59Z")
-            all_ohlcv = []
-            limit = 1000 
-            
-            while since < end_timestamp:
-                ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
-                if not ohlcv: break
-                all_ohlcv += ohlcv
-                last_timestamp = ohlcv[-1][0]
-                if last_timestamp >= end_timestamp: break
-                since = last_timestamp + 1 
-                total = end_timestamp - exchange.parse8601(f"{start_date}T00:00:00Z")
-                curr = last_timestamp - exchange.parse8601(f"{start_date}T00:00:00Z")
-                progress_bar.progress(min(curr / total, 1.0))
-                time.sleep(exchange.rateLimit / 1000 if exchange.rateLimit else 0.1)
-
-            if not all_ohlcv: continue
-            df = pd.DataFrame(all_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            mask = (df['timestamp'] >= pd.to_datetime(start_date)) & (df['timestamp'] <= pd.to_datetime(end_date) + timedelta(days=1))
-            df = df.loc[mask]
-            progress_bar.progress(1.0)
-            status_text.empty()
-            return df, exchange_name
-        except: continue
-    progress_bar.empty()
-    return None, "Fail"
-
-# --- 數學指標計算函數 ---
-def calculate_wma(series, window):
-    weights = np.arange(1, window + 1)
-    return series.rolling(window).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
-
-def calculate_hma(series, window):
-    half_window = int(window / 2)
-    sqrt_window = int(np.sqrt(window))
-    wma_half = calculate_wma(series, half_window)
-    wma_full = calculate_wma(series, window)
-    raw_hma = 2 * wma_half - wma_full
-    return calculate_wma(raw_hma, sqrt_window)
-
-def calculate_ma(series, window, ma_type):
-    if "EMA" in ma_type: return series.ewm(span=window, adjust=False).mean()
-    elif "HMA" in ma_type: return calculate_hma(series, window)
-    else: return series.rolling(window).mean()
-
-def calculate_mdd(equity_series):
-    running_max = equity_series.cummax()
-    drawdown = (equity_series - running_max) / running_max
-    return drawdown.min() * 100 
-
-def run_strategy(df_input, short_w, long_w, ma_type, capital, vol_ma_len):
-    df = df_input.copy()
-    col_s, col_l = f'MA_{short_w}', f'MA_{long_w}'
-    
-    # 1. 計算價格均線
-    df[col_s] = calculate_ma(df['close'], short_w, ma_type)
-    df[col_l] = calculate_ma(df['close'], long_w, ma_type)
-    
-    # 2. 計算成交量均線 (固定使用 SMA)
-    df['Vol_MA'] = df['volume'].rolling(window=vol_ma_len).mean()
-    
-    # 3. 策略訊號
-    df['Signal'] = 0
-    df.loc[(df[col_s] > df[col_l]) & (df[col_s].shift(1) <= df[col_l].shift(1)), 'Signal'] = 1
-    df.loc[(df[col_s] < df[col_l]) & (df[col_s].shift(1) >= df[col_l].shift(1)), 'Signal'] = -1
-    
-    balance = capital
-    position = 0
-    equity = []
-    trades = 0
-    trade_log = [] 
-    current_entry_price = 0
-    current_entry_time = None
-    buy_signals = []
-    sell_signals = []
-    
-    for i, row in df.iterrows():
-        price = row['close']
-        time = row['timestamp']
-        if row['Signal'] == 1 and position == 0:
-            position = balance / price
-            balance = 0
-            trades += 1
-            current_entry_price = price
-            current_entry_time = time
-            buy_signals.append((time, price))
-        elif row['Signal'] == -1 and position > 0:
-            balance = position * price
-            position = 0
-            trades += 1
-            sell_signals.append((time, price))
-            pnl = (price - current_entry_price) / current_entry_price * 100
-            trade_log.append({"買入時間": current_entry_time, "買入價格": current_entry_price, "賣出時間": time, "賣出價格": price, "單筆獲利 (%)": pnl})
-        equity.append(balance + (position * price))
-        
-    df['Equity'] = equity
-    final_equity = equity[-1]
-    roi = ((final_equity - capital) / capital) * 100
-    mdd = calculate_mdd(pd.Series(equity))
-    return {"final_equity": final_equity, "roi": roi, "trades": trades, "mdd": mdd, "df": df, "buys": buy_signals, "sells": sell_signals, "trade_log": pd.DataFrame(trade_log)}
-
-# --- 主程式執行 ---
-
-if start_date > end_date:
-    st.error("❌ 日期設定錯誤")
-else:
-    st.write(f"正在下載 **{selected_symbol}** 數據...")
-    raw_data, source = get_data_by_date_range(selected_symbol, timeframe, start_date, end_date)
-
-    if raw_data is not None and not raw_data.empty:
-        st.success(f"✅ 下載完成 (來源: {source}) | 共 {len(raw_data)} 根 K 棒")
-        
-        # 基準
-        bh_equity = initial_capital * (raw_data['close'] / raw_data['close'].iloc[0])
-        bh_roi = ((bh_equity.iloc[-1] - initial_capital) / initial_capital) * 100
-        bh_mdd = calculate_mdd(bh_equity)
-
-        # 執行策略
-        res_a = run_strategy(raw_data, short_a, long_a, ma_type_a, initial_capital, vol_ma_len)
-        res_b = run_strategy(raw_data, short_b, long_b, ma_type_b, initial_capital, vol_ma_len)
-        
-        # 看板
-        st.subheader("🏆 策略績效總覽")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.info(f"🔵 策略 A: {ma_type_a} ({short_a}/{long_a})")
-            st.metric("ROI", f"{res_a['roi']:.2f}%", f"{res_a['roi']-bh_roi:.2f}% vs B&H")
-            st.metric("MDD", f"{res_a['mdd']:.2f}%", delta_color="inverse")
-        with col2:
-            st.info(f"🟠 策略 B: {ma_type_b} ({short_b}/{long_b})")
-            st.metric("ROI", f"{res_b['roi']:.2f}%", f"{res_b['roi']-bh_roi:.2f}% vs B&H")
-            st.metric("MDD", f"{res_b['mdd']:.2f}%", delta_color="inverse")
-        with col3:
-            st.write("### 🏳️ Buy & Hold")
-            st.metric("ROI", f"{bh_roi:.2f}%")
-            st.metric("MDD", f"{bh_mdd:.2f}%")
-
-        # --- 詳細分析 (含成交量圖) ---
-        st.markdown("---")
-        st.subheader("🔎 詳細進出場與成交量分析")
-        view_option = st.radio("選擇要查看的策略詳情：", ("策略 A", "策略 B"), horizontal=True)
-        target_res = res_a if view_option == "策略 A" else res_b
-        target_short = short_a if view_option == "策略 A" else short_b
-        target_long = long_a if view_option == "策略 A" else long_b
-        
-        tab1, tab2 = st.tabs(["📈 K 線與成交量圖", "📋 交易明細表"])
-
-        with tab1:
-            df = target_res['df']
-            # 建立子圖 (2列 1行, 共享X軸, 上圖高下圖矮)
-            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, 
-                                vertical_spacing=0.03, subplot_titles=(f'{selected_symbol} 價格走勢', '成交量'),
-                                row_heights=[0.7, 0.3])
-
-            # 1. 上圖：K線與價格均線
-            fig.add_trace(go.Candlestick(x=df['timestamp'], open=df['open'], high=df['high'], low=df['low'], close=df['close'], name='價格'), row=1, col=1)
-            fig.add_trace(go.Scatter(x=df['timestamp'], y=df[f'MA_{target_short}'], line=dict(color='orange', width=1), name=f'MA {target_short}'), row=1, col=1)
-            fig.add_trace(go.Scatter(x=df['timestamp'], y=df[f'MA_{target_long}'], line=dict(color='blue', width=1), name=f'MA {target_long}'), row=1, col=1)
-            
-            # 買賣點標記
-            if target_res['buys']:
-                bx, by = zip(*target_res['buys'])
-                fig.add_trace(go.Scatter(x=bx, y=by, mode='markers', name='買進', marker=dict(symbol='triangle-up', size=15, color='#00CC96')), row=1, col=1)
-            if target_res['sells']:
-                sx, sy = zip(*target_res['sells'])
-                fig.add_trace(go.Scatter(x=sx, y=sy, mode='markers', name='賣出', marker=dict(symbol='triangle-down', size=15, color='#EF553B')), row=1, col=1)
-
-            # 2. 下圖：成交量與 Vol MA
-            # 設定顏色：收盤 >= 開盤 為綠色，否則為紅色
-            vol_colors = ['#00CC96' if c >= o else '#EF553B' for c, o in zip(df['close'], df['open'])]
-            
-            fig.add_trace(go.Bar(x=df['timestamp'], y=df['volume'], marker_color=vol_colors, name='成交量'), row=2, col=1)
-            
-            # 成交量均線 (白色線條)
-            fig.add_trace(go.Scatter(x=df['timestamp'], y=df['Vol_MA'], line=dict(color='white', width=1.5), name=f'Vol MA {vol_ma_len}'), row=2, col=1)
-
-            # 移除下方的 Range Slider
-            fig.update_layout(template='plotly_dark', height=700, xaxis_rangeslider_visible=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        with tab2:
-            if not target_res['trade_log'].empty:
-                styled_df = target_res['trade_log'].style.format({"買入價格": "${:.2f}", "賣出價格": "${:.2f}", "單筆獲利 (%)": "{:.2f}%"}).applymap(lambda v: 'color: green' if v > 0 else 'color: red', subset=['單筆獲利 (%)'])
-                st.dataframe(styled_df, use_container_width=True)
-            else:
-                st.warning("無交易紀錄")
-    else:
-        st.error("無法獲取數據")
@@ -0,0 +1,28 @@
+# 回測核心套件 (不依賴 Streamlit，可在腳本、批次研究與效能基準中直接匯入)：
+#   data / store / exchanges  數據下載、本地 K 線倉庫、交易所探測與備援 (ccxt 延遲匯入)
+#   datasets                  Parquet/Arrow/CSV 匯入 (memory map、少複製) 與批次匯出
+#   resample                  由最細週期在本地聚合較大週期 (只下載、儲存一種週期)
+#   indicators / cache        均線與成交量指標、跨策略共用的指標快取
+#   engine / metrics          向量化回測 (均線交叉 + 成交量過濾、停損/停利/移動停損) 與績效指標
+#   compact                   精簡記憶體模式 (float32 K 線與共用緩衝區)
+#   sweep / walkforward       參數掃描、滾動前進最佳化 (樣本外驗證)
+#   portfolio / live          多行程組合回測、即時增量更新
+#   profiling                 各階段計時與計數 (未啟用時幾乎零成本)、cProfile/pyinstrument 匯出
+#   chart                     K 線圖降採樣與圖表建構 (plotly 延遲匯入)
+# app.py 只負責 Streamlit 介面
+from .data import date_range_ms, fetch_ohlcv_range, timeframe_to_ms
+from .store import OHLCVStore
+from .exchanges import SOURCES, find_exchange, get_exchange, load_ohlcv
+from .datasets import export_bundle, import_to_store, infer_timeframe, read_ohlcv
+from .resample import base_range, can_resample, load_resampled, resample_ohlcv, select_resampled
+from .cache import IndicatorCache, fingerprint, indicator_cache
+from .indicators import cached_ma, cached_volume_ma, calculate_hma, calculate_ma, calculate_wma
+from .metrics import calculate_mdd, performance_metrics, periods_per_year
+from .engine import execution_costs, rule_signal, run_strategy, run_strategy_cached, simulate, strategy_rules
+from .compact import CompactCandles, StrategyView, compact_candles, memory_usage, run_strategy_compact
+from .sweep import sweep
+from .walkforward import walk_forward, walk_forward_windows
+from .portfolio import run_portfolio
+from .live import LiveStrategy, PollingFeed, ReplayFeed
+from .profiling import Profiler, start_profiling
+from .chart import MAX_POINTS, build_price_volume_figure, build_sweep_heatmap
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+
+DEFAULT_MAX_BYTES = int(os.environ.get('INDICATOR_CACHE_MB', 512)) * 1024 * 1024
+
+
+# id(DataFrame) -> (指紋, 簽章, 參照的陣列)；DataFrame 被回收時移除 (id 才可能被重用)
+_fingerprints = {}
+
+
+def fingerprint(df):
+    # K 線資料指紋：對 timestamp/close/volume 位元組做雜湊。
+    # 同一個 DataFrame 物件重複呼叫時沿用上次結果，但需筆數與各欄的記憶體位址都沒變：
+    # 換欄 (df['close'] = ...) 或複製後的新物件都會重算。保留對舊陣列的參照，舊位址不會被新陣列重用
+    columns = [df[col].to_numpy() for col in ('timestamp', 'close', 'volume') if col in df]
+    signature = (len(df),) + tuple(a.__array_interface__['data'][0] for a in columns)
+    cached = _fingerprints.get(id(df))
+    if cached and cached[1] == signature:
+        return cached[0]
+    h = hashlib.blake2b(digest_size=16)
+    for values in columns:
+        h.update(np.ascontiguousarray(values).view(np.uint8))
+    digest = h.hexdigest()
+    if id(df) not in _fingerprints: weakref.finalize(df, _fingerprints.pop, id(df), None)
+    _fingerprints[id(df)] = (digest, signature, columns)
+    return digest
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray) or hasattr(value, 'nbytes'): return int(value.nbytes)
+    if isinstance(value, (pd.DataFrame, pd.Series)): return int(value.memory_usage(deep=False).sum())
+    if isinstance(value, dict): return sum(_nbytes(v) for v in value.values())
+    return 64
+
+
+class IndicatorCache:
+    # 行程內共用的 LRU 快取 (跨策略、跨 rerun、跨使用者)，以 (資料指紋, 指標, 參數) 為鍵，超過記憶體上限時淘汰最久未用
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                profiling.count('cache_hits')
+                return self._entries[key][0]
+            self.misses += 1
+        profiling.count('cache_misses')
+        value = compute()
+        # 快取中的陣列設為唯讀，避免呼叫端就地修改污染其他使用者
+        if isinstance(value, np.ndarray): value.flags.writeable = False
+        size = _nbytes(value)
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+                while self.nbytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.nbytes, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+indicator_cache = IndicatorCache()
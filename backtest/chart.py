@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from . import profiling
+
+# 圖表寬度約 1000~2000 像素，超過這個根數瀏覽器也畫不出差異
+MAX_POINTS = 1500
+
+
+def downsample_ohlcv(df, max_points=MAX_POINTS):
+    # 依固定根數分桶聚合 K 棒：open 取第一根、high 取最大、low 取最小、close 取最後、volume 加總；
+    # 其餘欄位 (均線、Vol_MA、權益等) 取桶內最後一根。資料不超過 max_points 時原樣回傳
+    n = len(df)
+    if n <= max_points: return df
+    size = -(-n // max_points)
+    starts = np.arange(0, n, size)
+    ends = np.minimum(starts + size, n) - 1
+    out = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if col == 'timestamp' or col == 'open': out[col] = values[starts]
+        elif col == 'high': out[col] = np.maximum.reduceat(values, starts)
+        elif col == 'low': out[col] = np.minimum.reduceat(values, starts)
+        elif col == 'volume': out[col] = np.add.reduceat(values, starts)
+        else: out[col] = values[ends]
+    return pd.DataFrame(out)
+
+
+def build_price_volume_figure(df, res, symbol, short_w, long_w, vol_ma_len, max_points=MAX_POINTS):
+    with profiling.timer('chart:build'):
+        return _price_volume_figure(df, res, symbol, short_w, long_w, vol_ma_len, max_points)
+
+
+def _price_volume_figure(df, res, symbol, short_w, long_w, vol_ma_len, max_points):
+    # plotly 只在真的要畫圖時才匯入
+    import plotly.graph_objs as go
+    from plotly.subplots import make_subplots
+
+    view = downsample_ohlcv(df, max_points)
+    # 建立子圖 (2列 1行, 共享X軸, 上圖高下圖矮)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
+                        vertical_spacing=0.03, subplot_titles=(f'{symbol} 價格走勢', '成交量'),
+                        row_heights=[0.7, 0.3])
+
+    # 1. 上圖：K線與價格均線
+    fig.add_trace(go.Candlestick(x=view['timestamp'], open=view['open'], high=view['high'], low=view['low'], close=view['close'], name='價格'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=view['timestamp'], y=view[f'MA_{short_w}'], line=dict(color='orange', width=1), name=f'MA {short_w}'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=view['timestamp'], y=view[f'MA_{long_w}'], line=dict(color='blue', width=1), name=f'MA {long_w}'), row=1, col=1)
+
+    # 買賣點標記 (不聚合，維持原始時間與價格；只畫目前顯示區間內的點)
+    first, last = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
+    buys = [(t, p) for t, p in res['buys'] if first <= t <= last]
+    sells = [(t, p) for t, p in res['sells'] if first <= t <= last]
+    if buys:
+        bx, by = zip(*buys)
+        fig.add_trace(go.Scatter(x=bx, y=by, mode='markers', name='買進', marker=dict(symbol='triangle-up', size=15, color='#00CC96')), row=1, col=1)
+    if sells:
+        sx, sy = zip(*sells)
+        fig.add_trace(go.Scatter(x=sx, y=sy, mode='markers', name='賣出', marker=dict(symbol='triangle-down', size=15, color='#EF553B')), row=1, col=1)
+
+    # 2. 下圖：成交量與 Vol MA
+    # 設定顏色：收盤 >= 開盤 為綠色，否則為紅色
+    vol_colors = np.where(view['close'].to_numpy() >= view['open'].to_numpy(), '#00CC96', '#EF553B')
+    fig.add_trace(go.Bar(x=view['timestamp'], y=view['volume'], marker_color=vol_colors, name='成交量'), row=2, col=1)
+
+    # 成交量均線 (白色線條)
+    fig.add_trace(go.Scatter(x=view['timestamp'], y=view['Vol_MA'], line=dict(color='white', width=1.5), name=f'Vol MA {vol_ma_len}'), row=2, col=1)
+
+    # 移除下方的 Range Slider
+    fig.update_layout(template='plotly_dark', height=700, xaxis_rangeslider_visible=False)
+    return fig
+
+
+def build_sweep_heatmap(sweep_res, ma_type, zmid=None):
+    # 參數掃描熱力圖：縱軸短均線、橫軸長均線、顏色為 ROI
+    import plotly.graph_objs as go
+
+    heat = sweep_res[sweep_res['ma_type'] == ma_type].pivot(index='short', columns='long', values='roi')
+    fig = go.Figure(go.Heatmap(z=heat.values, x=heat.columns, y=heat.index, colorscale='RdYlGn', zmid=zmid, colorbar=dict(title='ROI (%)')))
+    fig.update_layout(template='plotly_dark', height=500, xaxis_title='長', yaxis_title='短')
+    return fig
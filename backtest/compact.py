@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .cache import fingerprint, indicator_cache
+from .engine import crossover_signal, execution_costs, rule_signal, simulate, strategy_rules, trade_records
+from .indicators import calculate_ma, ma_kind
+from .metrics import performance_metrics, periods_per_year
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def _decimals(values, max_decimals=8):
+    # 找出能完整表示所有值的最少小數位數 (交易所價格/數量的精度)，找不到回傳 None
+    finite = values[np.isfinite(values)]
+    for d in range(max_decimals + 1):
+        if np.array_equal(np.round(finite, d), finite):
+            return d
+    return None
+
+
+def _compact_column(values, rtol=None):
+    # 能以 float32 無損還原 (依小數位數四捨五入後與原值完全相同) 時改存 float32；
+    # 給定 rtol 時，無固定小數位的資料在相對誤差內也接受 float32
+    values = np.asarray(values, dtype=np.float64)
+    narrow = values.astype(np.float32)
+    d = _decimals(values)
+    if d is not None:
+        if np.array_equal(np.round(narrow.astype(np.float64), d), values, equal_nan=True):
+            return narrow, d
+    elif rtol is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            err = np.abs(narrow.astype(np.float64) - values) / np.abs(values)
+        if np.nanmax(err, initial=0) <= rtol:
+            return narrow, None
+    return values, None
+
+
+class CompactCandles:
+    # 精簡 K 線：int64 毫秒時間戳 + 逐欄 float32 (精度不足的欄位保留 float64)。
+    # 同一資料集的各策略共用這份緩衝區；建立後不再修改 (物件存在 indicator_cache，跨工作階段共用)
+    def __init__(self, timestamp, columns, decimals, key):
+        self.timestamp = timestamp
+        self.columns = columns
+        self.decimals = decimals
+        self.key = key
+
+    @classmethod
+    def from_frame(cls, df, rtol=None):
+        ts = df['timestamp'].to_numpy().astype('datetime64[ms]').astype(np.int64)
+        columns, decimals = {}, {}
+        for col in PRICE_COLUMNS:
+            columns[col], decimals[col] = _compact_column(df[col].to_numpy(), rtol)
+        return cls(ts, columns, decimals, fingerprint(df))
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def column(self, name, idx=slice(None)):
+        # 還原成 float64 (暫時陣列，用完即釋放)；有小數位資訊時四捨五入回原值
+        values = self.columns[name][idx].astype(np.float64)
+        return np.round(values, self.decimals[name]) if self.decimals[name] is not None else values
+
+    def frame(self, lo=0, hi=None):
+        # 暫時還原成與原始 K 線相同的 float64 DataFrame (匯出、參數掃描、即時模式暖機用)
+        idx = slice(lo, hi)
+        df = pd.DataFrame({'timestamp': pd.to_datetime(self.timestamp[idx], unit='ms')})
+        for col in PRICE_COLUMNS:
+            df[col] = self.column(col, idx)
+        return df
+
+    def times(self, idx=slice(None)):
+        return pd.Series(pd.to_datetime(self.timestamp[idx], unit='ms'))
+
+    def volume_ma(self, window):
+        # 各策略共用的 Vol_MA 也放在 indicator_cache：計入記憶體上限，並由快取的鎖保護
+        return indicator_cache.get((self.key, 'compact_vol_ma', window), lambda: pd.Series(self.column('volume')).rolling(window=window).mean().to_numpy(dtype=np.float32))
+
+    def time_range(self, start, end):
+        # 回傳 [start, end] 對應的列範圍 (lo, hi)
+        start, end = (pd.Timestamp(t).value // 1_000_000 for t in (start, end))
+        return np.searchsorted(self.timestamp, start, 'left'), np.searchsorted(self.timestamp, end, 'right')
+
+    @property
+    def nbytes(self):
+        return self.timestamp.nbytes + sum(a.nbytes for a in self.columns.values())
+
+
+class StrategyView:
+    # 單一策略的輸出：只持有自己的均線/訊號/權益陣列，K 線欄位參照共用的 CompactCandles
+    def __init__(self, candles, short_w, long_w, vol_ma, ma_s, ma_l, signal, equity):
+        self.candles = candles
+        self.short_w, self.long_w, self.vol_ma = short_w, long_w, vol_ma
+        self.ma_s, self.ma_l, self.signal, self.equity = ma_s, ma_l, signal, equity
+
+    @property
+    def nbytes(self):
+        return self.ma_s.nbytes + self.ma_l.nbytes + self.signal.nbytes + self.equity.nbytes
+
+    def frame(self, lo=0, hi=None):
+        # 只在需要時 (例如畫圖) 把 [lo, hi) 這一段組成 DataFrame，欄位與 run_strategy 的 df 相同
+        idx = slice(lo, hi)
+        c = self.candles
+        df = pd.DataFrame({'timestamp': pd.to_datetime(c.timestamp[idx], unit='ms')})
+        for col in PRICE_COLUMNS:
+            df[col] = c.columns[col][idx]
+        df[f'MA_{self.short_w}'] = self.ma_s[idx]
+        df[f'MA_{self.long_w}'] = self.ma_l[idx]
+        df['Vol_MA'] = self.vol_ma[idx]
+        df['Signal'] = self.signal[idx]
+        df['Equity'] = self.equity[idx]
+        return df
+
+
+def compact_candles(df, rtol=None):
+    return indicator_cache.get((fingerprint(df), 'compact', rtol), lambda: CompactCandles.from_frame(df, rtol))
+
+
+def run_strategy_compact(candles, short_w, long_w, ma_type, capital, vol_ma_len, costs=None, rules=None):
+    # 與 run_strategy 相同的回測，但不複製 K 線：均線 float32、訊號 int8、權益 float32 分開存放。
+    # 訊號與績效仍以 float64 計算，價格可無損還原時結果與 run_strategy 完全相同
+    key = (candles.key, 'strategy_compact', ma_kind(ma_type), short_w, long_w, capital, vol_ma_len, execution_costs(costs), strategy_rules(rules))
+
+    def compute():
+        close = candles.column('close')
+        series = pd.Series(close)
+        ma_s = calculate_ma(series, short_w, ma_type).to_numpy(dtype=np.float64)
+        ma_l = calculate_ma(series, long_w, ma_type).to_numpy(dtype=np.float64)
+        signal = crossover_signal(ma_s, ma_l)
+        open_ = candles.column('open') if execution_costs(costs)[3] else None
+        reasons = None
+        if any(strategy_rules(rules)):
+            # 成交量均線以 float64 重算 (共用的 volume_ma 為 float32)，過濾結果與 run_strategy 相同
+            volume = candles.column('volume')
+            with profiling.timer('rules'):
+                signal, reasons = rule_signal(signal, close, volume, pd.Series(volume).rolling(window=vol_ma_len).mean().to_numpy(), rules, costs, open_)
+        signal = signal.astype(np.int8)
+        profiling.count('bars:simulate', len(close))
+        with profiling.timer('simulate'):
+            sim = simulate(close, signal, capital, costs, open_)
+        equity, buy_idx, sell_idx = sim['equity'], sim['buy_idx'], sim['sell_idx']
+        buy_signals, sell_signals, trade_log = trade_records(candles.times, sim, execution_costs(costs)[0], reasons)
+        view = StrategyView(candles, short_w, long_w, candles.volume_ma(vol_ma_len), ma_s.astype(np.float32), ma_l.astype(np.float32), signal, equity.astype(np.float32))
+        final_equity = equity[-1]
+        return {"final_equity": final_equity, "roi": ((final_equity - capital) / capital) * 100, "trades": len(buy_idx) + len(sell_idx), **performance_metrics(equity, sim['position'] > 0, periods_per_year(candles.timestamp.astype('datetime64[ms]')), capital), "view": view, "buys": buy_signals, "sells": sell_signals, "trade_log": trade_log}
+
+    return indicator_cache.get(key, compute)
+
+
+def memory_usage(*objects):
+    # 估算常駐記憶體 (位元組)：同一物件只算一次，CompactCandles 由多個策略共用時也只算一次
+    seen, total = set(), 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if obj is None or id(obj) in seen: continue
+        seen.add(id(obj))
+        if isinstance(obj, pd.DataFrame): total += int(obj.memory_usage(index=True, deep=False).sum())
+        elif isinstance(obj, np.ndarray): total += obj.nbytes
+        elif isinstance(obj, CompactCandles): total += obj.nbytes
+        elif isinstance(obj, StrategyView):
+            # 共用的 K 線與 Vol_MA 經由 seen 只算一次
+            total += obj.nbytes
+            stack.extend([obj.candles, obj.vol_ma])
+        elif isinstance(obj, dict): stack.extend(obj.values())
+    return total
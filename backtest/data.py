@@ -0,0 +1,109 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from . import profiling
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+_UNIT_MS = {'s': 1000, 'm': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000, 'M': 2_592_000_000, 'y': 31_536_000_000}
+
+
+def date_range_ms(start_date, end_date):
+    # 日期 (含首尾兩天, UTC) 轉為 [since, until] 毫秒
+    since = int(pd.Timestamp(f"{start_date}T00:00:00Z").timestamp() * 1000)
+    until = int(pd.Timestamp(f"{end_date}T23:59:59Z").timestamp() * 1000)
+    return since, until
+
+
+def timeframe_to_ms(timeframe):
+    # 與 ccxt.Exchange.parse_timeframe 相同規則 ("15m" -> 900000)，但不需匯入 ccxt
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in _UNIT_MS or not amount.isdigit():
+        raise ValueError(f"無法解析的K線週期: {timeframe}")
+    return int(amount) * _UNIT_MS[unit]
+
+
+class TokenBucket:
+    # 執行緒安全的令牌桶：每秒補充 rate 個令牌，最多累積 capacity 個
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # 回傳等待的秒數 (效能分析用)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(exchange, capacity=4):
+    # 同一交易所在整個行程內共用一個限速器，多個使用者同時下載也不會超過 rateLimit
+    with _limiters_lock:
+        if exchange.id not in _limiters:
+            interval = (exchange.rateLimit or 100) / 1000
+            _limiters[exchange.id] = TokenBucket(1 / interval, capacity)
+        return _limiters[exchange.id]
+
+
+def _fetch_window(exchange, symbol, timeframe, since, until, limit, limiter):
+    # 抓取 [since, until) 內的 K 線；交易所單頁上限小於 limit 時在視窗內繼續翻頁。
+    # 回傳 (K 線, 請求頁數, 限速等待秒數)
+    tf_ms = timeframe_to_ms(timeframe)
+    rows = []
+    pages, waited = 0, 0.0
+    while since < until:
+        waited += limiter.acquire()
+        pages += 1
+        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+        if not ohlcv: break
+        rows += [row for row in ohlcv if since <= row[0] < until]
+        last_timestamp = ohlcv[-1][0]
+        if last_timestamp < since: break
+        # 下一頁從下一根 K 棒開始；整頁抓滿時已到視窗尾端，不再多送一次請求
+        since = last_timestamp + tf_ms
+    return rows, pages, waited
+
+
+def fetch_ohlcv_range(exchange, symbol, timeframe, since, until, limit=1000, max_workers=4, limiter=None, on_progress=None):
+    # 依週期事先切出每頁的時間視窗並行下載 [since, until] (毫秒, 含)，
+    # 共用令牌桶限速，最後依時間戳排序去重，回傳 ccxt 原始 [ts, o, h, l, c, v] 列表
+    limiter = limiter or get_rate_limiter(exchange)
+    span = limit * timeframe_to_ms(timeframe)
+    windows = [(start, min(start + span, until + 1)) for start in range(since, until + 1, span)]
+    pages = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+        futures = [pool.submit(_fetch_window, exchange, symbol, timeframe, start, end, limit, limiter) for start, end in windows]
+        # 進度回報留在呼叫端執行緒 (Streamlit 元件不能在工作執行緒更新)
+        for done, future in enumerate(as_completed(futures), 1):
+            rows, n_pages, waited = future.result()
+            pages.append(rows)
+            profiling.count('pages', n_pages)
+            profiling.count('rows_downloaded', len(rows))
+            # 下載量以 6 欄 float64 估算
+            profiling.count('bytes_downloaded', len(rows) * 48)
+            profiling.count('rate_limit_wait_seconds', waited)
+            if on_progress: on_progress(done / len(futures))
+    merged = {}
+    for page in pages:
+        for row in page:
+            merged[row[0]] = row
+    return [merged[ts] for ts in sorted(merged)]
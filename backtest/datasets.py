@@ -0,0 +1,159 @@
+import io
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .data import OHLCV_COLUMNS, timeframe_to_ms
+
+# 副檔名 -> 格式；Parquet 與 Arrow 需要 pyarrow (只在讀寫這兩種格式時才匯入)
+FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow', '.csv': 'csv', '.gz': 'csv'}
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("讀寫 Parquet / Arrow 需要 pyarrow：pip install pyarrow") from None
+    return pyarrow
+
+
+def _has_pyarrow():
+    try:
+        _pyarrow()
+    except ImportError:
+        return False
+    return True
+
+
+def detect_format(name):
+    fmt = FORMATS.get(os.path.splitext(str(name).lower())[1])
+    if fmt is None: raise ValueError(f"無法辨識的檔案格式: {name} (支援 {', '.join(sorted(FORMATS))})")
+    return fmt
+
+
+def _to_pandas(table):
+    # 每欄各自成為一個區塊 (不合併成二維區塊)，無缺值的數值欄可直接參照 Arrow 緩衝區，不另外複製
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_table(source, fmt=None):
+    # source 為路徑或檔案物件 (例如上傳的檔案)；路徑的 Arrow/Parquet 以 memory map 讀取
+    fmt = fmt or detect_format(getattr(source, 'name', source))
+    with profiling.timer(f'import:{fmt}'):
+        if fmt == 'csv':
+            # 上傳的檔案物件無法由路徑推斷壓縮格式；有 pyarrow 時用其多執行緒 CSV 解析器
+            gzip = str(getattr(source, 'name', source)).lower().endswith('.gz')
+            return pd.read_csv(source, compression='gzip' if gzip else 'infer', engine='pyarrow' if _has_pyarrow() else None)
+        pa = _pyarrow()
+        if fmt == 'parquet':
+            return _to_pandas(pa.parquet.read_table(source, memory_map=isinstance(source, (str, os.PathLike))))
+        if isinstance(source, (str, os.PathLike)):
+            source = pa.memory_map(str(source))
+        elif not hasattr(source, 'seek'):
+            source = io.BytesIO(source)
+        try:
+            return _to_pandas(pa.ipc.open_file(source).read_all())
+        except pa.ArrowInvalid:
+            # Arrow 串流格式 (沒有檔尾索引)
+            source.seek(0)
+            return _to_pandas(pa.ipc.open_stream(source).read_all())
+
+
+def _timestamps(values):
+    # 時間欄可為毫秒整數、秒整數或日期字串/時間型別，一律轉為 UTC naive datetime64[ms] (與倉庫相同)
+    if values.dtype.kind == 'M':
+        # 帶時區的欄位 (例如 Parquet 的 timestamp[ms, tz=UTC]) 先轉成 UTC naive，numpy 不支援時區
+        if getattr(values.dtype, 'tz', None) is not None: values = values.dt.tz_convert(None)
+        return values.to_numpy().astype('datetime64[ms]', copy=False)
+    if pd.api.types.is_numeric_dtype(values):
+        values = values.to_numpy()
+        unit = 's' if len(values) and values.max() < 10 ** 11 else 'ms'
+        return pd.to_datetime(values, unit=unit)
+    ts = pd.to_datetime(values, utc=True)
+    return ts.dt.tz_localize(None) if hasattr(ts, 'dt') else ts.tz_localize(None)
+
+
+def read_ohlcv(source, fmt=None):
+    # 讀取外部 K 線檔 (欄名不分大小寫，時間欄可叫 timestamp/time/date/datetime/open_time)，
+    # 回傳與 load_ohlcv 相同欄位、依時間排序去重的 DataFrame
+    df = read_table(source, fmt)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    time_col = next((c for c in ('timestamp', 'time', 'date', 'datetime', 'open_time') if c in df.columns), None)
+    missing = [c for c in OHLCV_COLUMNS[1:] if c not in df.columns]
+    if time_col is None or missing: raise ValueError(f"缺少欄位: {', '.join((['timestamp'] if time_col is None else []) + missing)}")
+    out = pd.DataFrame({'timestamp': _timestamps(df[time_col])})
+    for col in OHLCV_COLUMNS[1:]:
+        out[col] = df[col].to_numpy(dtype=np.float64, copy=False)
+    ts = out['timestamp'].to_numpy()
+    if len(ts) > 1 and not (ts[1:] > ts[:-1]).all():
+        out = out.drop_duplicates('timestamp', keep='last').sort_values('timestamp', ignore_index=True)
+    return out
+
+
+def infer_timeframe(df):
+    # 由最常見的相鄰 K 棒間距推回週期字串 (如 '15m'、'4h'、'1w')；少於兩根時回傳 None
+    if len(df) < 2: return None
+    ts = df['timestamp'].to_numpy().astype('datetime64[ms]').astype(np.int64)
+    steps, counts = np.unique(np.diff(ts), return_counts=True)
+    step = int(steps[counts.argmax()])
+    for unit in ('w', 'd', 'h', 'm'):
+        unit_ms = timeframe_to_ms('1' + unit)
+        if step % unit_ms == 0: return f"{step // unit_ms}{unit}"
+    raise ValueError(f"無法辨識的 K 棒間距: {step} ms")
+
+
+def import_to_store(store, source, exchange_id, symbol, timeframe=None, fmt=None):
+    # 把外部 K 線檔寫進本地倉庫 (exchange_id 用 SOURCES 內的 id，之後 load_ohlcv 在此區間直接命中倉庫、不需連線)；
+    # 回傳讀到的 DataFrame 與週期
+    df = read_ohlcv(source, fmt)
+    timeframe = timeframe or infer_timeframe(df)
+    if timeframe is None: raise ValueError("資料少於兩根 K 棒，請指定週期")
+    store.ingest(exchange_id, symbol, timeframe, df)
+    return df, timeframe
+
+
+def write_frame(df, target, fmt):
+    # 單一 DataFrame 寫入路徑或檔案物件；Arrow 為 IPC 檔案格式 (可 memory map 讀回)
+    with profiling.timer(f'export:{fmt}'):
+        if fmt == 'csv' and not _has_pyarrow():
+            df.to_csv(target, index=False)
+            return
+        pa = _pyarrow()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if fmt == 'csv':
+            import pyarrow.csv
+            pa.csv.write_csv(table, target)
+        elif fmt == 'parquet':
+            pa.parquet.write_table(table, target)
+        else:
+            with pa.ipc.new_file(target, table.schema) as writer:
+                writer.write_table(table)
+
+
+def frame_bytes(df, fmt):
+    buffer = io.BytesIO()
+    write_frame(df, buffer, fmt)
+    return buffer.getvalue()
+
+
+def export_bundle(frames, fmt, target=None):
+    # 批次匯出 {名稱: DataFrame} (K 線、指標、權益、交易明細…)：target 為目錄時每個表一個檔案，
+    # 否則打包成 zip 回傳位元組；空表略過
+    frames = {name: df for name, df in frames.items() if df is not None and not df.empty}
+    if target is not None:
+        os.makedirs(target, exist_ok=True)
+        for name, df in frames.items():
+            write_frame(df, os.path.join(target, name + EXTENSIONS[fmt]), fmt)
+        return target
+    buffer = io.BytesIO()
+    # Parquet / Arrow 本身已壓縮或可直接 memory map，zip 只做封裝
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED if fmt == 'csv' else zipfile.ZIP_STORED) as bundle:
+        for name, df in frames.items():
+            bundle.writestr(name + EXTENSIONS[fmt], frame_bytes(df, fmt))
+    return buffer.getvalue()
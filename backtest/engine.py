@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .cache import fingerprint, indicator_cache
+from .indicators import cached_ma, cached_volume_ma, calculate_ma, ma_kind
+from .metrics import performance_metrics, periods_per_year
+
+
+def _ffill_index(mask):
+    # 每根 K 棒對應到「最近一次 mask 為 True」的索引，之前沒有則為 -1
+    idx = np.where(mask, np.arange(len(mask)), -1)
+    return np.maximum.accumulate(idx)
+
+
+def crossover_signal(ma_short, ma_long):
+    # 黃金交叉 1、死亡交叉 -1，其餘 0 (與逐列比較 shift(1) 的規則相同，NaN 一律不成立)
+    prev_s = np.r_[np.nan, ma_short[:-1]]
+    prev_l = np.r_[np.nan, ma_long[:-1]]
+    signal = np.zeros(len(ma_short), dtype=np.int64)
+    signal[(ma_short > ma_long) & (prev_s <= prev_l)] = 1
+    signal[(ma_short < ma_long) & (prev_s >= prev_l)] = -1
+    return signal
+
+
+def execution_costs(costs=None):
+    # 成交模型參數 (可為 None，或含下列任意鍵的 dict)，回傳可作為快取鍵的 tuple：
+    #   fee          每邊手續費率 (例如 taker 0.001)
+    #   slippage_bps 滑價 (基點，買進價上調、賣出價下調)
+    #   size         每次進場投入目前現金的比例 (0~1，1 為全倉)
+    #   next_open    True 時訊號在收盤產生、下一根 K 棒開盤成交
+    costs = costs or {}
+    return (float(costs.get('fee', 0.0)), float(costs.get('slippage_bps', 0.0)), float(costs.get('size', 1.0)), bool(costs.get('next_open', False)))
+
+
+def fill_prices(close, open_, costs):
+    # 逐根的成交價 (買, 賣)：收盤或 (next_open 時) 當根開盤，再加上滑價
+    _, slippage_bps, _, next_open = costs
+    price = open_ if next_open else close
+    slip = slippage_bps / 10_000
+    return (price * (1 + slip) if slip else price), (price * (1 - slip) if slip else price)
+
+
+# 出場原因代碼 (交易明細顯示用)
+EXIT_REASONS = np.array(["死亡交叉", "停損", "停利", "移動停損"])
+
+
+def strategy_rules(rules=None):
+    # 進出場條件 (可為 None，或含下列任意鍵的 dict)，回傳可作為快取鍵的 tuple；全部為 0 時即原本的單純均線交叉：
+    #   volume_k     進場需成交量 > volume_k × Vol_MA (0 為不過濾)
+    #   stop_loss    收盤價跌破進場價 (1 - stop_loss) 出場
+    #   take_profit  收盤價漲破進場價 (1 + take_profit) 出場
+    #   trailing     收盤價自進場後最高收盤回落 trailing 比例出場
+    rules = rules or {}
+    return tuple(float(rules.get(name) or 0.0) for name in ('volume_k', 'stop_loss', 'take_profit', 'trailing'))
+
+
+def rule_signal(signal, close, volume, vol_ma, rules=None, costs=None, open_=None):
+    # 把均線交叉訊號與其他條件編譯成 simulate 用的訊號 (1 進場、-1 出場)，並回傳每筆出場的原因代碼。
+    # 多頭區段 (最近一次交叉為黃金交叉) 內第一根通過成交量過濾的 K 棒進場，區段結束 (死亡交叉) 或觸發停損/停利/移動停損時出場；
+    # 提前出場後同一區段不再進場，等下一次黃金交叉。因此每筆交易的範圍在出場前就已確定，
+    # 與路徑有關的出場只是「每筆交易內」的分段掃描 (分段累積最高價)，全部以向量運算完成，不需逐根的狀態機
+    volume_k, stop_loss, take_profit, trailing = strategy_rules(rules)
+    n = len(signal)
+    last = _ffill_index(signal != 0)
+    up = np.where(last >= 0, signal[np.maximum(last, 0)], 0) == 1
+    prev_up = np.r_[False, up[:-1]]
+    run_id = np.cumsum(up & ~prev_up)
+    run_ends = np.flatnonzero(~up & prev_up)
+    ok = up & (volume > volume_k * vol_ma) if volume_k else up
+    ok_idx = np.flatnonzero(ok)
+    _, first = np.unique(run_id[ok_idx], return_index=True)
+    entry = ok_idx[first]
+    # 區段結束的那根 (死亡交叉)；最後一段尚未結束時為 n
+    exit_ = np.r_[run_ends, n][np.searchsorted(run_ends, entry)]
+    reason = np.zeros(len(entry), dtype=np.int8)
+
+    if (stop_loss or take_profit or trailing) and len(entry):
+        # 持倉中 (進場後到死亡交叉前) 的每根 K 棒與所屬交易；參考價為實際進場成交價
+        edges = np.zeros(n + 1, dtype=np.int64)
+        np.add.at(edges, entry + 1, 1)
+        np.add.at(edges, exit_, -1)
+        idx = np.flatnonzero(np.cumsum(edges[:n]) > 0)
+        trade = np.searchsorted(entry, idx, 'right') - 1
+        costs = execution_costs(costs)
+        buy_price, _ = fill_prices(close, open_, costs)
+        ref = buy_price[np.minimum(entry + costs[3], n - 1)][trade]
+        c = close[idx]
+        code = np.zeros(len(idx), dtype=np.int8)
+        # 同一根同時觸發時依 停損 > 移動停損 > 停利 (較保守)
+        if take_profit: code[c >= ref * (1 + take_profit)] = 2
+        if trailing:
+            peak = np.maximum(pd.Series(c).groupby(trade).cummax().to_numpy(), ref)
+            code[c <= peak * (1 - trailing)] = 3
+        if stop_loss: code[c <= ref * (1 - stop_loss)] = 1
+        hit = np.flatnonzero(code)
+        hit_trade, first = np.unique(trade[hit], return_index=True)
+        exit_[hit_trade] = idx[hit[first]]
+        reason[hit_trade] = code[hit[first]]
+
+    out = np.zeros(n, dtype=np.int64)
+    out[entry] = 1
+    closed = exit_ < n
+    out[exit_[closed]] = -1
+    return out, reason[closed]
+
+
+def simulate(close, signal, capital, costs=None, open_=None):
+    # 空手遇 1 買進 (投入現金的 size 比例)、持倉遇 -1 全部賣出；手續費與滑價見 execution_costs。
+    # 持倉狀態 = 最近一個非零訊號 (前向填補)，只對「成交」做 O(交易數) 的迴圈，
+    # 逐根的部位與餘額再前向填補；無成本時權益算式與逐列迴圈完全相同 (結果逐位元一致)
+    fee, slippage_bps, size, next_open = costs = execution_costs(costs)
+    n = len(close)
+    last = _ffill_index(signal != 0)
+    long_state = np.where(last >= 0, signal[np.maximum(last, 0)], 0) == 1
+    # 下一根開盤成交：持倉狀態整體延後一根 (最後一根的訊號來不及成交)
+    if next_open: long_state = np.r_[False, long_state[:-1]]
+    prev_state = np.r_[False, long_state[:-1]]
+    buy_idx = np.flatnonzero(long_state & ~prev_state)
+    sell_idx = np.flatnonzero(~long_state & prev_state)
+    buy_price, sell_price = fill_prices(close, open_, costs)
+    buy_px, sell_px = buy_price[buy_idx], sell_price[sell_idx]
+
+    units = np.empty(len(buy_idx))
+    rests = np.empty(len(buy_idx))
+    balances = np.empty(len(sell_idx))
+    balance = capital
+    for k in range(len(buy_idx)):
+        units[k] = balance * size * (1 - fee) / buy_px[k]
+        rests[k] = balance * (1 - size)
+        if k < len(sell_idx):
+            balance = rests[k] + units[k] * sell_px[k] * (1 - fee)
+            balances[k] = balance
+
+    position = np.zeros(n)
+    position[buy_idx] = units
+    cash = np.zeros(n)
+    cash[buy_idx] = rests
+    cash[sell_idx] = balances
+    event = np.zeros(n, dtype=bool)
+    event[buy_idx] = event[sell_idx] = True
+    last = _ffill_index(event)
+    has_event = last >= 0
+    last = np.maximum(last, 0)
+    position = np.where(has_event, position[last], 0)
+    cash = np.where(has_event, cash[last], capital)
+    equity = cash + position * close
+    return {"equity": equity, "buy_idx": buy_idx, "sell_idx": sell_idx, "buy_px": buy_px, "sell_px": sell_px, "position": position, "cash": cash}
+
+
+def trade_records(times_at, sim, fee=0.0, reasons=None):
+    # 由成交索引與成交價產生買賣點列表與交易明細；times_at(idx) 回傳對應的時間 (Series)。
+    # 單筆獲利為扣除雙邊手續費後的報酬；reasons 為 rule_signal 的出場原因代碼 (有時多一欄「出場原因」)
+    buy_idx, sell_idx, buy_px, sell_px = sim['buy_idx'], sim['sell_idx'], sim['buy_px'], sim['sell_px']
+    buy_signals = list(zip(times_at(buy_idx), buy_px.tolist()))
+    sell_signals = list(zip(times_at(sell_idx), sell_px.tolist()))
+    entry, exit_ = buy_px[:len(sell_idx)], sell_px
+    net_exit = exit_ * (1 - fee) ** 2 if fee else exit_
+    trade_log = pd.DataFrame({"買入時間": times_at(buy_idx[:len(sell_idx)]).to_numpy(), "買入價格": entry, "賣出時間": times_at(sell_idx).to_numpy(), "賣出價格": exit_, "單筆獲利 (%)": (net_exit - entry) / entry * 100}) if len(sell_idx) else pd.DataFrame()
+    # next_open 時最後一根的出場訊號來不及成交，原因代碼可能比實際賣出多一筆
+    if reasons is not None and len(sell_idx): trade_log["出場原因"] = EXIT_REASONS[reasons[:len(sell_idx)]]
+    return buy_signals, sell_signals, trade_log
+
+
+def run_strategy(df_input, short_w, long_w, ma_type, capital, vol_ma_len, costs=None, rules=None):
+    df = df_input.copy()
+    col_s, col_l = f'MA_{short_w}', f'MA_{long_w}'
+
+    # 1. 計算價格均線 (經指標快取，A/B 共用相同視窗時只算一次)
+    df[col_s] = cached_ma(df_input, short_w, ma_type)
+    df[col_l] = cached_ma(df_input, long_w, ma_type)
+
+    # 2. 計算成交量均線 (固定使用 SMA)
+    df['Vol_MA'] = cached_volume_ma(df_input, vol_ma_len)
+
+    # 3. 策略訊號 (均線交叉，再疊加成交量過濾與停損/停利/移動停損)
+    signal = crossover_signal(df[col_s].to_numpy(dtype=float), df[col_l].to_numpy(dtype=float))
+    close = df['close'].to_numpy(dtype=float)
+    open_ = df['open'].to_numpy(dtype=float)
+    reasons = None
+    if any(strategy_rules(rules)):
+        with profiling.timer('rules'):
+            signal, reasons = rule_signal(signal, close, df['volume'].to_numpy(dtype=float), df['Vol_MA'].to_numpy(), rules, costs, open_)
+    df['Signal'] = signal
+
+    # 4. 向量化回測 (含手續費、滑價、部位比例與成交時點)
+    profiling.count('bars:simulate', len(close))
+    with profiling.timer('simulate'):
+        sim = simulate(close, signal, capital, costs, open_)
+    equity, buy_idx, sell_idx = sim['equity'], sim['buy_idx'], sim['sell_idx']
+    buy_signals, sell_signals, trade_log = trade_records(lambda idx: df['timestamp'].iloc[idx], sim, execution_costs(costs)[0], reasons)
+
+    df['Equity'] = equity
+    final_equity = equity[-1]
+    roi = ((final_equity - capital) / capital) * 100
+    # 5. 績效指標 (MDD、回撤時間、Sharpe/Sortino/Calmar、勝率、獲利因子、曝險) 一次算完
+    metrics = performance_metrics(equity, sim['position'] > 0, periods_per_year(df['timestamp']), capital)
+    return {"final_equity": final_equity, "roi": roi, "trades": len(buy_idx) + len(sell_idx), **metrics, "df": df, "buys": buy_signals, "sells": sell_signals, "trade_log": trade_log}
+
+
+def run_strategy_cached(df_input, short_w, long_w, ma_type, capital, vol_ma_len, costs=None, rules=None):
+    # 參數與資料都沒變時直接回傳上次結果 (切換檢視等 rerun 不重算)；回傳物件為共用，呼叫端不可修改
+    key = (fingerprint(df_input), 'strategy', ma_kind(ma_type), short_w, long_w, capital, vol_ma_len, execution_costs(costs), strategy_rules(rules))
+    return indicator_cache.get(key, lambda: run_strategy(df_input, short_w, long_w, ma_type, capital, vol_ma_len, costs, rules))
+
+
+def evaluate(close, short_w, long_w, ma_type, capital, bars_per_year=None, costs=None, open_=None):
+    # 只需績效數字時使用 (不建 DataFrame、不產生交易明細)，結果與 run_strategy 相同
+    series = pd.Series(close, dtype=np.float64)
+    signal = crossover_signal(calculate_ma(series, short_w, ma_type).to_numpy(), calculate_ma(series, long_w, ma_type).to_numpy())
+    sim = simulate(series.to_numpy(), signal, capital, costs, open_)
+    equity = sim['equity']
+    return {"final_equity": equity[-1], "roi": ((equity[-1] - capital) / capital) * 100, "trades": len(sim['buy_idx']) + len(sim['sell_idx']), **performance_metrics(equity, sim['position'] > 0, bars_per_year, capital)}
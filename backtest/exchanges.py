@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+
+from . import profiling
+from .data import fetch_ohlcv_range
+
+# 依優先順序排列的資料來源 (顯示名稱, ccxt id)
+SOURCES = [('Binance', 'binance'), ('Binance US', 'binanceus'), ('Kraken', 'kraken')]
+PROBE_TIMEOUT = 8
+SYMBOL_MEMO_TTL = 600
+
+_instances = {}
+_instances_lock = threading.Lock()
+_symbol_memo = {}
+log = logging.getLogger(__name__)
+
+
+def get_exchange(exchange_id):
+    # 每個行程只建立一次交易所物件，load_markets 的結果也跟著物件重複使用
+    with _instances_lock:
+        if exchange_id not in _instances:
+            import ccxt
+            _instances[exchange_id] = getattr(ccxt, exchange_id)({'timeout': PROBE_TIMEOUT * 1000})
+        return _instances[exchange_id]
+
+
+def register_exchange(exchange):
+    # 注入自訂交易所物件 (例如 FakeExchange)，之後 get_exchange 直接回傳
+    with _instances_lock:
+        _instances[exchange.id] = exchange
+
+
+def probe(exchange, symbol, timeframe):
+    if exchange.markets is None:
+        exchange.load_markets()
+    if symbol not in exchange.markets: return False
+    return bool(exchange.fetch_ohlcv(symbol, timeframe, limit=1))
+
+
+def find_exchange(symbol, timeframe, sources=SOURCES, timeout=PROBE_TIMEOUT, errors=None):
+    # 同時探測所有來源，依 sources 的優先順序選出第一個健康的：某來源只有在所有較優先的來源都失敗或逾時後才會勝出，
+    # 等待時間為 max(較優先來源的探測) 而非 sum(逾時)。errors (dict) 會填入各來源的失敗原因 {顯示名稱: 訊息}
+    memo = _symbol_memo.get((symbol, timeframe))
+    # 名稱與 id 都要符合：同名來源可能指向不同的交易所物件
+    if memo and memo[2] > time.monotonic() and (memo[0], memo[1]) in sources:
+        return memo[0], get_exchange(memo[1])
+    pool = ThreadPoolExecutor(max_workers=len(sources))
+    futures = {}
+    for name, exchange_id in sources:
+        exchange = get_exchange(exchange_id)
+        futures[pool.submit(probe, exchange, symbol, timeframe)] = (name, exchange)
+    winner, failures, healthy = None, {}, set()
+
+    def first_healthy():
+        # 依優先順序掃描：遇到尚未完成的探測就得繼續等
+        for future, source in futures.items():
+            if future in healthy: return source
+            if source[0] not in failures: return None
+        return None
+
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            name = futures[future][0]
+            if future.exception() is not None:
+                failures[name] = f"探測失敗: {future.exception()!r}"
+                log.warning("probe %s %s %s failed: %r", name, symbol, timeframe, future.exception())
+            elif not future.result():
+                failures[name] = "不支援此交易對或沒有資料"
+            else:
+                healthy.add(future)
+            winner = first_healthy()
+            if winner: break
+    except TimeoutError:
+        for future, (name, _) in futures.items():
+            if future in healthy or name in failures: continue
+            # 逾時當下剛完成、還沒輪到處理的探測仍算數
+            if future.done() and future.exception() is None and future.result():
+                healthy.add(future)
+            elif future.done():
+                failures[name] = "不支援此交易對或沒有資料" if future.exception() is None else f"探測失敗: {future.exception()!r}"
+            else:
+                failures[name] = f"探測逾時 ({timeout}s)"
+                log.warning("probe %s %s %s timed out after %ss", name, symbol, timeframe, timeout)
+        winner = first_healthy()
+    if errors is not None and winner is None: errors.update(failures)
+    # 不等待較慢的探測結束
+    pool.shutdown(wait=False, cancel_futures=True)
+    if winner:
+        _symbol_memo[(symbol, timeframe)] = (winner[0], winner[1].id, time.monotonic() + SYMBOL_MEMO_TTL)
+    return winner or (None, None)
+
+
+def load_ohlcv(symbol, timeframe, since, until, store, sources=SOURCES, on_status=None, on_progress=None):
+    # 先找本地倉庫已完整覆蓋的來源 (不需連線)，否則探測並只補抓缺口；回傳 (DataFrame, 來源名稱)
+    for name, exchange_id in sources:
+        if not store.covers(exchange_id, symbol, timeframe, since, until): continue
+        with profiling.timer('fetch:store_read'):
+            df = store.load(exchange_id, symbol, timeframe, since, until)
+        # 已覆蓋但區間內沒有 K 棒 (例如該段交易所停機) 時改用下一個來源
+        if df.empty: continue
+        profiling.count('store_hits')
+        return df, name
+    remaining, errors = list(sources), {}
+    while remaining:
+        with profiling.timer('fetch:probe'):
+            name, exchange = find_exchange(symbol, timeframe, remaining, errors=errors)
+        if exchange is None: break
+        if on_status: on_status(f"正在從 {name} 下載數據...")
+
+        def fetch(gap_since, gap_until):
+            return fetch_ohlcv_range(exchange, symbol, timeframe, gap_since, gap_until, on_progress=on_progress)
+
+        try:
+            with profiling.timer('fetch:download'):
+                df = store.load(exchange.id, symbol, timeframe, since, until, fetch)
+            if not df.empty: return df, name
+            errors[name] = "區間內沒有資料"
+        except Exception as e:
+            errors[name] = f"下載失敗: {e!r}"
+            log.warning("download %s %s %s failed", name, symbol, timeframe, exc_info=True)
+        _symbol_memo.pop((symbol, timeframe), None)
+        remaining = [source for source in remaining if source[0] != name]
+    # 失敗時第二個值帶各來源的原因，讓介面顯示而非只有 "Fail"
+    return None, failure_message(errors)
+
+
+def failure_message(errors):
+    if not errors: return "Fail"
+    return "Fail (" + "; ".join(f"{name}: {reason}" for name, reason in errors.items()) + ")"
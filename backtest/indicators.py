@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import profiling
+from .cache import fingerprint, indicator_cache
+
+
+def wma_block(window):
+    # wma_values 每段的輸出根數 (即時模式的 RollingWMA 依相同切段，結果逐位元一致)
+    return max(64 * window, 256)
+
+
+def wma_values(values, window):
+    # O(n) 加權移動平均：分子 = w*C_t - sum(C_{t-1..t-w})，C 為累加和。
+    # 全域累加和在長序列上會相減抵銷精度，因此切成 64*w 根一段、各自從 0 累加 (二維一次算完)，
+    # 相對誤差約 1e-12；視窗內含 NaN 的位置輸出 NaN (與 rolling(window).apply 相同)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(n, np.nan)
+    if window < 1 or window > n: return out
+    nan_mask = np.isnan(values)
+    x = np.where(nan_mask, 0.0, values)
+    block = wma_block(window)
+    n_out = n - window + 1
+    n_blocks = -(-n_out // block)
+    seg_len = block + window - 1
+    padded = np.zeros(n_blocks * block + window - 1)
+    padded[:n] = x
+    segments = sliding_window_view(padded, seg_len)[::block]
+    c = np.zeros((n_blocks, seg_len + 1))
+    np.cumsum(segments, axis=1, out=c[:, 1:])
+    d = np.zeros((n_blocks, seg_len + 2))
+    np.cumsum(c, axis=1, out=d[:, 1:])
+    numerator = window * c[:, window:] - (d[:, window:window + block] - d[:, :block])
+    out[window - 1:] = numerator.ravel()[:n_out] / (window * (window + 1) / 2)
+    if nan_mask.any():
+        nan_count = np.cumsum(np.r_[0, nan_mask])
+        out[window - 1:][(nan_count[window:] - nan_count[:-window]) > 0] = np.nan
+    return out
+
+
+# --- 數學指標計算函數 ---
+def calculate_wma(series, window):
+    return pd.Series(wma_values(series.to_numpy(dtype=np.float64), window), index=series.index)
+
+def calculate_hma(series, window):
+    half_window = int(window / 2)
+    sqrt_window = int(np.sqrt(window))
+    wma_half = calculate_wma(series, half_window)
+    wma_full = calculate_wma(series, window)
+    raw_hma = 2 * wma_half - wma_full
+    return calculate_wma(raw_hma, sqrt_window)
+
+def calculate_ma(series, window, ma_type):
+    kind = ma_kind(ma_type)
+    profiling.count(f'bars:indicator:{kind}', len(series))
+    with profiling.timer(f'indicator:{kind}'):
+        if kind == "EMA": return series.ewm(span=window, adjust=False).mean()
+        elif kind == "HMA": return calculate_hma(series, window)
+        else: return series.rolling(window).mean()
+
+def ma_kind(ma_type):
+    # 與 calculate_ma 相同的判斷順序，把介面上的名稱 ("EMA (指數)") 正規化成快取鍵
+    if "EMA" in ma_type: return "EMA"
+    elif "HMA" in ma_type: return "HMA"
+    else: return "SMA"
+
+# --- 以資料指紋快取的指標 (同一資料集的相同指標只計算一次) ---
+def cached_ma(df, window, ma_type):
+    key = (fingerprint(df), 'MA', ma_kind(ma_type), window)
+    return indicator_cache.get(key, lambda: calculate_ma(df['close'], window, ma_type).to_numpy(dtype=np.float64))
+
+def cached_volume_ma(df, window):
+    key = (fingerprint(df), 'Vol_MA', window)
+    return indicator_cache.get(key, lambda: df['volume'].rolling(window=window).mean().to_numpy(dtype=np.float64))
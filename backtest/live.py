@@ -0,0 +1,286 @@
+import math
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .data import timeframe_to_ms
+from .engine import crossover_signal, simulate
+from .indicators import calculate_ma, ma_kind, wma_block, wma_values
+
+
+# --- 增量指標：每根新 K 棒 O(1) 更新，結果與批次版 calculate_ma 一致 ---
+class RollingSMA:
+    # 對應 series.rolling(window).mean()：與 pandas 相同的 Kahan 補償加總 (加入、移出各自一個補償項)
+    # 與同值/正負號修正，結果逐位元一致。補償狀態從序列開頭累積，因此 seed 需走過全部歷史 (一次 O(n))
+    def __init__(self, window):
+        self.window = window
+        self.buffer = deque(maxlen=window)
+        self.total = self.add_comp = self.remove_comp = 0.0
+        self.nobs = self.neg_ct = self.same_count = 0
+        self.prev = np.nan
+        self.value = np.nan
+
+    def seed(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values): self.prev = float(values[0])
+        for x in values.tolist():
+            self._push(x)
+        self._finish()
+        return self
+
+    def _push(self, x):
+        if len(self.buffer) == self.window:
+            old = self.buffer[0]
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.remove_comp
+                t = self.total + y
+                self.remove_comp = t - self.total - y
+                self.total = t
+                if math.copysign(1.0, old) < 0: self.neg_ct -= 1
+        self.buffer.append(x)
+        if x == x:
+            self.nobs += 1
+            y = x - self.add_comp
+            t = self.total + y
+            self.add_comp = t - self.total - y
+            self.total = t
+            if math.copysign(1.0, x) < 0: self.neg_ct += 1
+            self.same_count = self.same_count + 1 if x == self.prev else 1
+            self.prev = x
+
+    def _finish(self):
+        if self.nobs < self.window:
+            self.value = np.nan
+        elif self.same_count >= self.nobs:
+            self.value = self.prev
+        else:
+            value = self.total / self.nobs
+            if (self.neg_ct == 0 and value < 0) or (self.neg_ct == self.nobs and value > 0): value = 0.0
+            self.value = value
+
+    def update(self, x):
+        if not self.buffer and not self.nobs: self.prev = x
+        self._push(x)
+        self._finish()
+        return self.value
+
+
+class RollingEMA:
+    # 對應 series.ewm(span=window, adjust=False).mean()：沿用 pandas ewm 的權重更新 (alpha 由 com 換算、
+    # 新舊權重相加後相除、與前值相同時不更新)，結果逐位元一致
+    def __init__(self, window):
+        self.alpha = 1.0 / (1.0 + (window - 1) / 2.0)
+        self.factor = 1.0 - self.alpha
+        self.old_wt = 1.0
+        self.window = window
+        self.value = np.nan
+
+    def seed(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values): return self
+        self.value = float(pd.Series(values).ewm(span=self.window, adjust=False).mean().iloc[-1])
+        # 結尾的 NaN 不更新均線，但舊權重仍逐根衰減
+        observed = np.flatnonzero(~np.isnan(values))
+        if len(observed):
+            for _ in range(len(values) - 1 - observed[-1]):
+                self.old_wt *= self.factor
+        return self
+
+    def update(self, x):
+        if self.value == self.value:
+            self.old_wt *= self.factor
+            if x == x:
+                if self.value != x: self.value = (self.old_wt * self.value + self.alpha * x) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif x == x:
+            self.value = x
+        return self.value
+
+
+class RollingWMA:
+    # 與 wma_values 逐位元一致：依相同的切段 (wma_block) 從段首累加 C (累加和) 與 D (C 的累加和)，
+    # 分子 = w*C - (D - w 根前的 D)；NaN 以 0 累加並另計視窗內 NaN 數。
+    # 相鄰兩段重疊 w-1 根，交界處同時更新兩段，每根仍為 O(1)
+    def __init__(self, window):
+        self.window = window
+        self.block = wma_block(window)
+        self.count = 0
+        # 每段為 [起點, C, D, 最近 w+1 個 D]
+        self.segments = deque()
+        self.nans = deque(maxlen=max(window, 1))
+        self.nan_count = 0
+        self.value = np.nan
+
+    def _emit(self):
+        j = self.count - self.window
+        if self.window < 1 or j < 0 or self.nan_count:
+            self.value = np.nan
+            return self.value
+        while self.segments[0][0] + self.block <= j: self.segments.popleft()
+        _, c, d, history = self.segments[0]
+        self.value = (self.window * c - (d - history[0])) / (self.window * (self.window + 1) / 2)
+        return self.value
+
+    def seed(self, values):
+        # 只有仍會用到的段 (最多兩段、約 2*64*w 根) 需要重算累加和，用 numpy 一次算完
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        self.count = n
+        if self.window < 1: return self
+        nan_mask = np.isnan(values[-self.window:])
+        self.nans = deque(nan_mask.tolist(), maxlen=self.window)
+        self.nan_count = int(nan_mask.sum())
+        x = np.where(np.isnan(values), 0.0, values)
+        self.segments = deque()
+        for start in range(max(0, (n - 1) // self.block - 1) * self.block, n, self.block):
+            if start + self.block <= n - self.window: continue
+            c = np.zeros(n - start + 1)
+            np.cumsum(x[start:], out=c[1:])
+            d = np.zeros(n - start + 2)
+            np.cumsum(c, out=d[1:])
+            m = n - start
+            self.segments.append([start, float(c[m]), float(d[m]), deque(d[max(0, m - self.window):m + 1].tolist(), maxlen=self.window + 1)])
+        self._emit()
+        return self
+
+    def update(self, x):
+        i = self.count
+        self.count += 1
+        if self.window < 1: return self._emit()
+        is_nan = x != x
+        if len(self.nans) == self.window: self.nan_count -= self.nans[0]
+        self.nans.append(is_nan)
+        self.nan_count += is_nan
+        v = 0.0 if is_nan else x
+        if i % self.block == 0: self.segments.append([i, 0.0, 0.0, deque([0.0], maxlen=self.window + 1)])
+        for segment in self.segments:
+            segment[2] += segment[1]
+            segment[1] += v
+            segment[3].append(segment[2])
+        return self._emit()
+
+
+class RollingHMA:
+    def __init__(self, window):
+        self.half = RollingWMA(int(window / 2))
+        self.full = RollingWMA(window)
+        self.smooth = RollingWMA(int(np.sqrt(window)))
+        self.window = window
+        self.value = np.nan
+
+    def seed(self, values):
+        # 三層 WMA 的切段都從序列開頭算起，因此平滑層也以完整的 raw_hma 暖機
+        values = np.asarray(values, dtype=np.float64)
+        self.half.seed(values)
+        self.full.seed(values)
+        self.smooth.seed(2 * wma_values(values, self.half.window) - wma_values(values, self.window))
+        self.value = self.smooth.value
+        return self
+
+    def update(self, x):
+        raw = 2 * self.half.update(x) - self.full.update(x)
+        self.value = self.smooth.update(raw)
+        return self.value
+
+
+def rolling_ma(window, ma_type):
+    return {"EMA": RollingEMA, "HMA": RollingHMA, "SMA": RollingSMA}[ma_kind(ma_type)](window)
+
+
+class LiveStrategy:
+    # 與 run_strategy 相同規則的增量版本：先用歷史資料暖機，之後每根收盤 K 棒 O(1) 更新均線、訊號與權益
+    def __init__(self, short_w, long_w, ma_type, capital, vol_ma_len):
+        self.short_w, self.long_w, self.ma_type, self.capital = short_w, long_w, ma_type, capital
+        self.ma_s = rolling_ma(short_w, ma_type)
+        self.ma_l = rolling_ma(long_w, ma_type)
+        self.vol_ma = RollingSMA(vol_ma_len)
+        self.prev_s = self.prev_l = np.nan
+        self.balance, self.position = capital, 0
+        self.entry_price, self.entry_time = 0, None
+        self.trades = 0
+        self.trade_log = []
+        self.last_timestamp = None
+        self.equity = capital
+
+    def seed(self, df):
+        close = df['close'].to_numpy(dtype=np.float64)
+        if not len(close): return self
+        self.ma_s.seed(close)
+        self.ma_l.seed(close)
+        self.vol_ma.seed(df['volume'].to_numpy(dtype=np.float64))
+        self.prev_s, self.prev_l = self.ma_s.value, self.ma_l.value
+        # 權益狀態用批次引擎一次算出，再接續增量更新
+        ma_s = calculate_ma(df['close'], self.short_w, self.ma_type).to_numpy(dtype=np.float64)
+        ma_l = calculate_ma(df['close'], self.long_w, self.ma_type).to_numpy(dtype=np.float64)
+        sim = simulate(close, crossover_signal(ma_s, ma_l), self.capital)
+        self.balance, self.position = sim['cash'][-1], sim['position'][-1]
+        self.trades = len(sim['buy_idx']) + len(sim['sell_idx'])
+        if len(sim['buy_idx']) > len(sim['sell_idx']):
+            self.entry_price = close[sim['buy_idx'][-1]]
+            self.entry_time = df['timestamp'].iloc[sim['buy_idx'][-1]]
+        self.equity = sim['equity'][-1]
+        self.last_timestamp = df['timestamp'].iloc[-1]
+        return self
+
+    def update(self, timestamp, close, volume):
+        s, l = self.ma_s.update(close), self.ma_l.update(close)
+        vol_ma = self.vol_ma.update(volume)
+        signal = 0
+        if s > l and self.prev_s <= self.prev_l: signal = 1
+        elif s < l and self.prev_s >= self.prev_l: signal = -1
+        self.prev_s, self.prev_l = s, l
+        action = None
+        if signal == 1 and self.position == 0:
+            self.position = self.balance / close
+            self.balance = 0
+            self.trades += 1
+            self.entry_price, self.entry_time = close, timestamp
+            action = 'buy'
+        elif signal == -1 and self.position > 0:
+            self.balance = self.position * close
+            self.position = 0
+            self.trades += 1
+            pnl = (close - self.entry_price) / self.entry_price * 100
+            self.trade_log.append({"買入時間": self.entry_time, "買入價格": self.entry_price, "賣出時間": timestamp, "賣出價格": close, "單筆獲利 (%)": pnl})
+            action = 'sell'
+        self.equity = self.balance + (self.position * close)
+        self.last_timestamp = timestamp
+        return {"timestamp": timestamp, "close": close, f"MA_{self.short_w}": s, f"MA_{self.long_w}": l, "Vol_MA": vol_ma, "Signal": signal, "Equity": self.equity, "action": action}
+
+
+# --- 即時資料來源：逐根產生「已收盤」的 K 棒 [ts, o, h, l, c, v] ---
+class ReplayFeed:
+    # 以加速倍率回放已存的 K 棒 (離線測試用)；speed=None 代表不等待
+    def __init__(self, candles, timeframe, speed=None):
+        self.candles = candles.itertuples(index=False) if isinstance(candles, pd.DataFrame) else candles
+        self.interval = timeframe_to_ms(timeframe) / 1000 / speed if speed else 0
+
+    def __iter__(self):
+        for candle in self.candles:
+            if self.interval: time.sleep(self.interval)
+            ts = candle[0]
+            yield [int(pd.Timestamp(ts).value // 1_000_000) if not isinstance(ts, (int, np.integer)) else int(ts)] + [float(v) for v in candle[1:6]]
+
+
+class PollingFeed:
+    # 定期向交易所查詢 since 之後的 K 棒，只送出已收盤的部分
+    def __init__(self, exchange, symbol, timeframe, since, poll_seconds=10):
+        self.exchange, self.symbol, self.timeframe = exchange, symbol, timeframe
+        self.since = since
+        self.tf_ms = timeframe_to_ms(timeframe)
+        self.poll_seconds = poll_seconds
+
+    def poll(self):
+        now = int(time.time() * 1000)
+        rows = self.exchange.fetch_ohlcv(self.symbol, self.timeframe, since=self.since) or []
+        closed = [row for row in rows if row[0] >= self.since and row[0] + self.tf_ms <= now]
+        if closed: self.since = closed[-1][0] + 1
+        return closed
+
+    def __iter__(self):
+        while True:
+            yield from self.poll()
+            time.sleep(self.poll_seconds)
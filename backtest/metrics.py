@@ -0,0 +1,100 @@
+import numpy as np
+
+from . import profiling
+
+YEAR_MS = 365 * 24 * 60 * 60 * 1000
+
+# performance_metrics 的輸出欄位 (mdd 固定在第一個)
+METRIC_COLUMNS = ["mdd", "dd_duration", "sharpe", "sortino", "calmar", "win_rate", "profit_factor", "exposure"]
+
+
+# --- 績效指標 ---
+def calculate_mdd(equity_series):
+    # 接受 Series 或陣列 (一維單一曲線、二維每列一條曲線)，回傳最大回撤 (%)
+    equity = np.asarray(equity_series, dtype=np.float64)
+    running_max = np.maximum.accumulate(equity, axis=-1)
+    return ((equity - running_max) / running_max).min(axis=-1) * 100
+
+
+def periods_per_year(timestamps):
+    # 由相鄰 K 棒的時間差 (中位數) 推算一年有幾根，用於年化
+    ms = np.asarray(timestamps).astype('datetime64[ms]').astype(np.int64)
+    if len(ms) < 2: return np.nan
+    return YEAR_MS / np.median(np.diff(ms))
+
+
+def _trade_returns(equity, state, capital):
+    # 每筆已平倉交易的報酬：出場 (狀態 1→0) 時的權益 ÷ 進場成交前一根的權益 (尚未扣進場手續費、
+    # 也涵蓋開盤成交到收盤的價差)，與交易明細的單筆獲利一致；二維時以扁平索引一次算完。
+    # 每列的狀態變化必定是 進、出、進、出… 交替，因此每個出場的進場就是扁平列表中的前一個事件。
+    # 回傳 (所屬列, 報酬)；持倉到最後一根仍未平倉的交易不計 (與交易明細一致)
+    change = np.empty(state.shape, dtype=bool)
+    change[:, 0] = state[:, 0]
+    np.not_equal(state[:, 1:], state[:, :-1], out=change[:, 1:])
+    rows, cols = np.nonzero(change)
+    exits = np.flatnonzero(~state[rows, cols])
+    trade_rows, entry_cols = rows[exits], cols[exits - 1]
+    # 第一根就進場時，成交前的權益即初始本金
+    before = np.where(entry_cols > 0, equity[trade_rows, np.maximum(entry_cols - 1, 0)], np.broadcast_to(capital, equity.shape[:1])[trade_rows])
+    return trade_rows, equity[trade_rows, cols[exits]] / before - 1
+
+
+def performance_metrics(equity, state=None, bars_per_year=None, capital=None):
+    # 一次算出所有績效指標；equity 為一維 (單一策略) 或二維 (每列一個策略) 的權益曲線，
+    # state 為同形狀的持倉狀態 (布林)，給定時才計算勝率、獲利因子與曝險比例。
+    # 每個指標都是沿時間軸的向量化歸約，批次排名上千組策略只需一次呼叫；回傳 {指標: 純量或每列陣列}
+    with profiling.timer('metrics'):
+        return _performance_metrics(equity, state, bars_per_year, capital)
+
+
+def _performance_metrics(equity, state, bars_per_year, capital):
+    single = np.ndim(equity) == 1
+    equity = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    rows, n = equity.shape
+    capital = equity[:, 0] if capital is None else capital
+
+    # 回撤與最長水下時間 (距離上一個新高的 K 棒數)；大型暫存陣列盡量就地重用
+    running_max = np.maximum.accumulate(equity, axis=1)
+    drawdown = np.subtract(equity, running_max)
+    drawdown /= running_max
+    mdd = drawdown.min(axis=1) * 100
+    # 新高的位置 (逐列、由左到右)；兩個新高之間 (或最後一個新高到結尾) 的間距即水下時間
+    peak_rows, peak_cols = np.nonzero(drawdown == 0)
+    del running_max, drawdown
+    next_peak = np.empty_like(peak_cols)
+    next_peak[:-1] = peak_cols[1:]
+    next_peak[np.r_[peak_rows[1:] != peak_rows[:-1], True]] = n
+    dd_duration = np.maximum.reduceat(next_peak - peak_cols - 1, np.searchsorted(peak_rows, np.arange(rows)))
+
+    # 逐根報酬的 Sharpe / Sortino (無風險利率 0)，bars_per_year 給定時年化
+    returns = np.divide(equity[:, 1:], equity[:, :-1])
+    returns -= 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = returns.mean(axis=1) if n > 1 else np.full(rows, np.nan)
+        squares = np.einsum('ij,ij->i', returns, returns)
+        std = np.sqrt(np.maximum(squares - (n - 1) * mean ** 2, 0) / (n - 2)) if n > 2 else np.full(rows, np.nan)
+        np.minimum(returns, 0, out=returns)
+        downside = np.sqrt(np.einsum('ij,ij->i', returns, returns) / (n - 1))
+        scale = np.sqrt(bars_per_year) if bars_per_year else 1.0
+        sharpe = np.where(std > 0, mean / std * scale, np.nan)
+        sortino = np.where(downside > 0, mean / downside * scale, np.nan)
+        total = equity[:, -1] / capital
+        years = (n - 1) / bars_per_year if bars_per_year else np.nan
+        cagr = (total ** (1 / years) - 1) * 100 if years else np.full(rows, np.nan)
+        calmar = np.where(mdd < 0, cagr / -mdd, np.nan)
+
+    result = {"mdd": mdd, "dd_duration": dd_duration, "sharpe": sharpe, "sortino": sortino, "calmar": calmar,
+              "win_rate": np.full(rows, np.nan), "profit_factor": np.full(rows, np.nan), "exposure": np.full(rows, np.nan)}
+    if state is not None:
+        state = np.atleast_2d(np.asarray(state, dtype=bool))
+        result["exposure"] = state.mean(axis=1) * 100
+        trade_rows, trade_ret = _trade_returns(equity, state, capital)
+        count = np.bincount(trade_rows, minlength=rows)
+        wins = np.bincount(trade_rows, weights=trade_ret > 0, minlength=rows)
+        gains = np.bincount(trade_rows, weights=np.maximum(trade_ret, 0), minlength=rows)
+        losses = np.bincount(trade_rows, weights=np.maximum(-trade_ret, 0), minlength=rows)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result["win_rate"] = np.where(count > 0, wins / count * 100, np.nan)
+            result["profit_factor"] = np.where(losses > 0, gains / losses, np.where(gains > 0, np.inf, np.nan))
+    if single: result = {k: v[0].item() for k, v in result.items()}
+    return result
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from .data import date_range_ms, timeframe_to_ms
+from .engine import evaluate
+from .exchanges import load_ohlcv
+from .metrics import METRIC_COLUMNS, periods_per_year
+from .resample import load_resampled
+from .store import OHLCVStore
+
+
+def _run_task(shm_name, n_bars, configs, capital, bars_per_year=None, costs=None):
+    # 工作行程：以共享記憶體中的收盤/開盤價直接建立陣列 (不 pickle DataFrame)，依序跑完一組策略設定
+    # spawn 啟動的子行程與主行程共用 resource_tracker，附掛不會造成重複清除
+    shm = SharedMemory(name=shm_name)
+    prices = np.ndarray((2, n_bars), dtype=np.float64, buffer=shm.buf)
+    try:
+        return [evaluate(prices[0], short_w, long_w, ma_type, capital, bars_per_year, costs, prices[1]) for ma_type, short_w, long_w in configs]
+    finally:
+        del prices
+        shm.close()
+
+
+def _share(prices):
+    shm = SharedMemory(create=True, size=max(prices.nbytes, 1))
+    np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+    return shm
+
+
+def run_portfolio(symbols, timeframes, configs, start_date, end_date, capital, store=None, max_workers=None, on_progress=None, base_timeframe=None, costs=None):
+    # 多交易對 x 多週期 x 多策略設定 批次回測，回傳依 ROI 排序的總表。
+    # configs 為 [(均線種類, 短, 長), ...]，costs 為成交模型 (見 engine.execution_costs)；數據走與介面相同的 load_ohlcv (本地倉庫 + 交易所備援)
+    store = store or OHLCVStore()
+    since, until = date_range_ms(start_date, end_date)
+    jobs = [(symbol, tf) for symbol in symbols for tf in timeframes]
+    # 給定 base_timeframe 時每個交易對只下載該週期，其餘週期在本地聚合 (各週期共用同一段基礎資料)
+    span = max(timeframes, key=timeframe_to_ms) if timeframes else None
+
+    def load(job):
+        if base_timeframe: return load_resampled(job[0], job[1], since, until, store, base_timeframe, span)
+        return load_ohlcv(job[0], job[1], since, until, store)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        loaded = dict(zip(jobs, pool.map(load, jobs)))
+
+    max_workers = max_workers or os.cpu_count()
+    # 每個資料集切成數塊，讓 CPU 數多於資料集時也能分滿
+    chunk = max(1, -(-len(configs) * len(jobs) // (max_workers * 4)))
+    rows, blocks, futures = [], [], {}
+    # Streamlit 伺服器本身是多執行緒，fork 不安全，因此用 spawn 啟動工作行程
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        try:
+            for (symbol, tf), (df, source) in loaded.items():
+                if df is None or df.empty:
+                    rows.append({"symbol": symbol, "timeframe": tf, "source": source})
+                    continue
+                close = df['close'].to_numpy(dtype=np.float64)
+                shm = _share(np.vstack([close, df['open'].to_numpy(dtype=np.float64)]))
+                blocks.append(shm)
+                bh_roi = (close[-1] - close[0]) / close[0] * 100
+                base = {"symbol": symbol, "timeframe": tf, "source": source, "bars": len(close), "bh_roi": bh_roi}
+                for start in range(0, len(configs), chunk):
+                    part = configs[start:start + chunk]
+                    futures[pool.submit(_run_task, shm.name, len(close), part, capital, periods_per_year(df['timestamp']), costs)] = (base, part)
+            for done, future in enumerate(as_completed(futures), 1):
+                base, part = futures[future]
+                for (ma_type, short_w, long_w), result in zip(part, future.result()):
+                    rows.append({**base, "ma_type": ma_type, "short": short_w, "long": long_w, **result})
+                if on_progress: on_progress(done / len(futures))
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    columns = ["symbol", "timeframe", "ma_type", "short", "long", "source", "bars", "final_equity", "roi", "mdd", "trades", "bh_roi"] + METRIC_COLUMNS[1:]
+    table = pd.DataFrame(rows, columns=columns).sort_values('roi', ascending=False, na_position='last').reset_index(drop=True)
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table
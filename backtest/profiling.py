@@ -0,0 +1,127 @@
+import contextvars
+import io
+import json
+import time
+from contextlib import nullcontext
+
+import pandas as pd
+
+# 目前執行緒 (Streamlit 每個工作階段的腳本執行緒) 啟用中的 Profiler；未啟用時為 None，
+# 各模組的 timer()/count() 只多一次 ContextVar 查詢
+_current = contextvars.ContextVar('backtest_profiler', default=None)
+_NULL = nullcontext()
+
+
+class _Timer:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler, self.name = profiler, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    # 單次執行的計時與計數：各階段 (次數, 秒數) 與計數器 (下載頁數、資料量、快取命中、處理 K 棒數…)；
+    # mode 為 'cprofile' 或 'pyinstrument' 時同時錄製完整呼叫堆疊 (pyinstrument 延遲匯入，未安裝時報錯)
+    def __init__(self, mode=None):
+        self.mode = mode
+        self.stages = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self._token = None
+        self._recorder = None
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        calls, total = self.stages.get(name, (0, 0.0))
+        self.stages[name] = (calls + 1, total + seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def start(self):
+        if self.mode == 'cprofile':
+            import cProfile
+            self._recorder = cProfile.Profile()
+            self._recorder.enable()
+        elif self.mode == 'pyinstrument':
+            from pyinstrument import Profiler as Recorder
+            self._recorder = Recorder()
+            self._recorder.start()
+        self.started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def stop(self):
+        if self.elapsed is not None: return self
+        self.elapsed = time.perf_counter() - self.started
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        if self.mode == 'cprofile': self._recorder.disable()
+        elif self.mode == 'pyinstrument': self._recorder.stop()
+        return self
+
+    def report(self):
+        # 各階段耗時表 (依秒數排序)，佔比以整次執行時間為分母；階段可能巢狀，佔比加總可超過 100%
+        total = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        rows = [{"stage": name, "calls": calls, "seconds": seconds, "share": seconds / total * 100 if total else None} for name, (calls, seconds) in self.stages.items()]
+        return pd.DataFrame(rows, columns=["stage", "calls", "seconds", "share"]).sort_values('seconds', ascending=False, ignore_index=True)
+
+    def throughput(self):
+        # 每秒處理的 K 棒數：bars:<階段> 計數器除以同名階段的秒數
+        out = {}
+        for name, bars in self.counters.items():
+            if name.startswith('bars:') and self.stages.get(name[5:], (0, 0))[1] > 0:
+                out[name[5:]] = bars / self.stages[name[5:]][1]
+        return out
+
+    def to_dict(self):
+        return {"elapsed": self.elapsed, "stages": {name: {"calls": c, "seconds": s} for name, (c, s) in self.stages.items()}, "counters": self.counters, "bars_per_second": self.throughput()}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, default=float)
+
+    def dump(self):
+        # 完整呼叫堆疊的匯出內容：cProfile 為 pstats 二進位檔，pyinstrument 為 HTML；未錄製時為 None
+        if self._recorder is None: return None
+        if self.mode == 'pyinstrument': return self._recorder.output_html().encode()
+        import marshal
+        self._recorder.create_stats()
+        return marshal.dumps(self._recorder.stats)
+
+    def top_functions(self, limit=25):
+        # cProfile 依累計時間排序的前幾名 (文字)，方便直接在介面上看
+        if self.mode != 'cprofile' or self._recorder is None: return None
+        import pstats
+        out = io.StringIO()
+        pstats.Stats(self._recorder, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+def start_profiling(enabled, mode=None):
+    # 每次 rerun 呼叫一次：啟用時回傳開始計時的 Profiler，否則清除目前執行緒的 Profiler 並回傳 None
+    if not enabled:
+        _current.set(None)
+        return None
+    return Profiler(mode).start()
+
+
+def timer(name):
+    profiler = _current.get()
+    return profiler.timer(name) if profiler is not None else _NULL
+
+
+def count(name, n=1):
+    profiler = _current.get()
+    if profiler is not None: profiler.count(name, n)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .cache import fingerprint, indicator_cache
+from .data import OHLCV_COLUMNS, timeframe_to_ms
+from .exchanges import load_ohlcv
+
+# 交易所的週 K 從週一 00:00 UTC 開始；1970-01-01 是週四，因此週線區間要往後平移 4 天
+WEEK_OFFSET_MS = 4 * 86_400_000
+
+
+def _bucket_offset(timeframe):
+    if timeframe[-1] in ('M', 'y'): raise ValueError(f"不支援聚合成月/年線: {timeframe}")
+    return WEEK_OFFSET_MS if timeframe[-1] == 'w' else 0
+
+
+def bucket_start(ts_ms, timeframe):
+    # 每個毫秒時間戳所屬的 K 棒開盤時間 (與交易所相同的對齊方式)
+    tf_ms = timeframe_to_ms(timeframe)
+    offset = _bucket_offset(timeframe)
+    return (np.asarray(ts_ms, dtype=np.int64) - offset) // tf_ms * tf_ms + offset
+
+
+def can_resample(base_timeframe, timeframe):
+    # 目標週期必須是基礎週期的整數倍，且基礎 K 棒不會跨越目標區間的邊界
+    try:
+        _bucket_offset(timeframe)
+        tf_ms, base_ms = timeframe_to_ms(timeframe), timeframe_to_ms(base_timeframe)
+    except ValueError:
+        return False
+    return tf_ms >= base_ms and tf_ms % base_ms == 0 and _bucket_offset(timeframe) % base_ms == 0
+
+
+def resample_ohlcv(df, timeframe):
+    # 向量化聚合：open 取區間第一根、high 最大、low 最小、close 最後一根、volume 加總；
+    # 區間依交易所規則對齊 (epoch 整數倍，週線從週一開始)，df 需依時間排序
+    if df.empty: return df[OHLCV_COLUMNS].copy()
+    ts = df['timestamp'].to_numpy().astype('datetime64[ms]').astype(np.int64)
+    bucket = bucket_start(ts, timeframe)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    out = pd.DataFrame({'timestamp': pd.to_datetime(bucket[starts], unit='ms')})
+    out['open'] = df['open'].to_numpy(dtype=np.float64)[starts]
+    out['high'] = np.maximum.reduceat(df['high'].to_numpy(dtype=np.float64), starts)
+    out['low'] = np.minimum.reduceat(df['low'].to_numpy(dtype=np.float64), starts)
+    out['close'] = df['close'].to_numpy(dtype=np.float64)[ends]
+    out['volume'] = np.add.reduceat(df['volume'].to_numpy(dtype=np.float64), starts)
+    return out
+
+
+def resample_cached(df, timeframe):
+    # 同一份基礎 K 線聚合成同一週期只算一次；回傳物件為共用，呼叫端不可修改
+    def compute():
+        with profiling.timer('resample'):
+            return resample_ohlcv(df, timeframe)
+
+    return indicator_cache.get((fingerprint(df), 'resample', timeframe), compute)
+
+
+def base_range(since, until, span_timeframe):
+    # 基礎週期要下載的區間：尾端延伸到 span_timeframe 那根 K 棒結束，讓最後一根聚合 K 棒完整
+    return since, int(bucket_start(until, span_timeframe)) + timeframe_to_ms(span_timeframe) - 1
+
+
+def select_resampled(base_df, timeframe, since, until):
+    # 由基礎 K 線聚合出 [since, until] 內開盤的 K 棒 (與直接向交易所要該週期的結果相同)；
+    # 開盤時間早於 since 的區間資料不完整，捨棄
+    df = resample_cached(base_df, timeframe)
+    ts = df['timestamp'].to_numpy().astype('datetime64[ms]').astype(np.int64)
+    lo, hi = np.searchsorted(ts, since, 'left'), np.searchsorted(ts, until, 'right')
+    return df.iloc[lo:hi].reset_index(drop=True)
+
+
+def load_resampled(symbol, timeframe, since, until, store, base_timeframe, span_timeframe=None, **kwargs):
+    # 只下載並儲存 base_timeframe，較大週期在本地聚合；span_timeframe 設為介面上最大的週期時，
+    # 所有週期共用同一段基礎資料，切換週期不需再連線。無法由基礎週期聚合時直接下載該週期
+    if not can_resample(base_timeframe, timeframe):
+        return load_ohlcv(symbol, timeframe, since, until, store, **kwargs)
+    if span_timeframe is None or timeframe_to_ms(span_timeframe) < timeframe_to_ms(timeframe): span_timeframe = timeframe
+    base_since, base_until = base_range(since, until, span_timeframe)
+    base_df, source = load_ohlcv(symbol, base_timeframe, base_since, base_until, store, **kwargs)
+    if base_df is None: return None, source
+    df = select_resampled(base_df, timeframe, since, until)
+    return (df, source) if not df.empty else (None, "Fail")
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .data import OHLCV_COLUMNS, timeframe_to_ms
+
+DEFAULT_ROOT = os.environ.get('OHLCV_STORE_DIR', '.ohlcv_store')
+
+# 每個 交易所/交易對/週期 目錄一把鎖，行程內所有 OHLCVStore 實例共用 (Streamlit 每次 rerun 都會建新實例)
+_path_locks = {}
+_path_locks_lock = threading.Lock()
+
+
+def _path_lock(path):
+    path = os.path.abspath(path)
+    with _path_locks_lock:
+        return _path_locks.setdefault(path, threading.Lock())
+
+
+def _data_files(meta):
+    # meta.json 的 version 指向同一次寫入的兩個陣列檔；舊版倉庫沒有 version，使用固定檔名
+    version = meta.get('version')
+    return ('timestamp.npy', 'ohlcv.npy') if version is None else (f'timestamp-{version}.npy', f'ohlcv-{version}.npy')
+
+
+def _merge_ranges(ranges):
+    # 合併重疊或相鄰的 [start, end] 毫秒區間
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _missing_ranges(ranges, start, end):
+    # 回傳 [start, end] 中尚未被 ranges 覆蓋的缺口
+    gaps = []
+    cursor = start
+    for r_start, r_end in ranges:
+        if r_end < cursor: continue
+        if r_start > end: break
+        if r_start > cursor: gaps.append((cursor, r_start - 1))
+        cursor = max(cursor, r_end + 1)
+    if cursor <= end: gaps.append((cursor, end))
+    return gaps
+
+
+def _merge_rows(ts, values, new_ts, new_values):
+    # 依時間戳合併並排序；同一時間戳保留新的那一筆
+    all_ts = np.concatenate([np.asarray(ts), new_ts])
+    all_values = np.concatenate([np.asarray(values), new_values])
+    order = np.argsort(all_ts[::-1], kind='stable')
+    all_ts, idx = np.unique(all_ts[::-1][order], return_index=True)
+    return all_ts, all_values[::-1][order][idx]
+
+
+class OHLCVStore:
+    # 本地 K 線倉庫：依 交易所/交易對/週期 分目錄，以 .npy (可 memory-map) 儲存，
+    # meta.json 記錄已完整下載的時間區間，只向交易所補抓頭尾缺口
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def _path(self, exchange_id, symbol, timeframe):
+        return os.path.join(self.root, exchange_id, symbol.replace('/', '-').replace(':', '_'), timeframe)
+
+    def _read(self, path):
+        meta_file = os.path.join(path, 'meta.json')
+        # 讀 meta 與開檔之間若有其他行程寫入並清掉舊版本，重讀一次 meta
+        for attempt in range(3):
+            if not os.path.exists(meta_file):
+                return np.empty(0, dtype=np.int64), np.empty((0, 5)), []
+            with open(meta_file) as f:
+                meta = json.load(f)
+            ts_name, values_name = _data_files(meta)
+            try:
+                ts = np.load(os.path.join(path, ts_name), mmap_mode='r')
+                values = np.load(os.path.join(path, values_name), mmap_mode='r')
+            except FileNotFoundError:
+                if attempt == 2: raise
+                continue
+            return ts, values, meta['ranges']
+
+    def _write(self, path, ts, values, ranges):
+        # 每次寫入一組新版本的陣列檔 (唯一檔名)，最後以 os.replace 切換 meta.json：
+        # 讀取端看到的 timestamp 與 ohlcv 一定來自同一次寫入，也不會讀到寫到一半的檔案
+        os.makedirs(path, exist_ok=True)
+        meta_file = os.path.join(path, 'meta.json')
+        previous = None
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                previous = _data_files(json.load(f))
+        version = uuid.uuid4().hex[:16]
+        meta = {'ranges': ranges, 'version': version}
+        for name, arr in zip(_data_files(meta), (ts, values)):
+            with open(os.path.join(path, name), 'wb') as f:
+                np.save(f, arr)
+        tmp = os.path.join(path, f'.meta.json.{version}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_file)
+        # 只刪除被取代的那一版 (其他行程尚未發布的版本不動)；已 memory-map 的讀取端不受影響，無法刪除時略過
+        for name in previous or ():
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+    def covers(self, exchange_id, symbol, timeframe, start, end):
+        _, _, ranges = self._read(self._path(exchange_id, symbol, timeframe))
+        return not _missing_ranges(ranges, start, end)
+
+    def load(self, exchange_id, symbol, timeframe, start, end, fetch=None):
+        # start / end 為毫秒 (含)；fetch(since, until) 需回傳 ccxt 格式的 K 線列表
+        path = self._path(exchange_id, symbol, timeframe)
+        with _path_lock(path):
+            ts, values, ranges = self._read(path)
+            gaps = _missing_ranges(ranges, start, end)
+            if gaps and fetch is not None:
+                ts, values, ranges = self._fill(path, ts, values, ranges, gaps, timeframe, fetch)
+        lo, hi = np.searchsorted(ts, start, 'left'), np.searchsorted(ts, end, 'right')
+        df = pd.DataFrame(np.asarray(values[lo:hi]), columns=OHLCV_COLUMNS[1:])
+        df.insert(0, 'timestamp', pd.to_datetime(np.asarray(ts[lo:hi]), unit='ms'))
+        return df
+
+    def _fill(self, path, ts, values, ranges, gaps, timeframe, fetch):
+        tf_ms = timeframe_to_ms(timeframe)
+        # 尚未收盤的 K 棒仍會變動，覆蓋區間只記到最後一根已收盤 K 棒，下次會重抓尾端
+        closed_until = int(time.time() * 1000) // tf_ms * tf_ms - 1
+        new_rows = []
+        for since, until in gaps:
+            rows = fetch(since, until)
+            new_rows += rows
+            # 沒有回傳任何 K 棒的缺口不記為已覆蓋 (交易所尚無該段資料、或忽略 since 只回最近幾根時被濾光)；
+            # 有資料時從第一根 K 棒所在的週期開始記，之前那段下次仍會補抓
+            if not rows: continue
+            start = max(since, int(min(row[0] for row in rows)) - tf_ms + 1)
+            if start <= closed_until:
+                ranges = ranges + [[start, min(until, closed_until)]]
+        if not new_rows: return ts, values, ranges
+        new = np.asarray(new_rows, dtype=np.float64)
+        ts, values = _merge_rows(ts, values, new[:, 0].astype(np.int64), new[:, 1:6])
+        ranges = _merge_ranges(ranges)
+        self._write(path, np.ascontiguousarray(ts, dtype=np.int64), np.ascontiguousarray(values, dtype=np.float64), ranges)
+        return ts, values, ranges
+
+    def ingest(self, exchange_id, symbol, timeframe, df):
+        # 匯入外部取得的 K 線 (例如離線的 Parquet 檔)：與既有資料合併，並把連續無缺漏的區段記為已覆蓋，
+        # 之後 load_ohlcv 在這些區段內直接讀本地倉庫、不需連線；檔案中間缺的 K 棒下次仍會向交易所補抓
+        if df.empty: return
+        path = self._path(exchange_id, symbol, timeframe)
+        timestamps = df['timestamp']
+        if getattr(timestamps.dtype, 'tz', None) is not None: timestamps = timestamps.dt.tz_convert(None)
+        new_ts = timestamps.to_numpy().astype('datetime64[ms]').astype(np.int64)
+        new_values = df[OHLCV_COLUMNS[1:]].to_numpy(dtype=np.float64)
+        tf_ms = timeframe_to_ms(timeframe)
+        closed_until = int(time.time() * 1000) // tf_ms * tf_ms - 1
+        with _path_lock(path):
+            ts, values, ranges = self._read(path)
+            ts, values = _merge_rows(ts, values, new_ts, new_values)
+            # 相鄰兩根間距超過一個週期處切段
+            run_ts = np.unique(new_ts)
+            breaks = np.flatnonzero(np.diff(run_ts) > tf_ms)
+            starts, ends = run_ts[np.r_[0, breaks + 1]], run_ts[np.r_[breaks, len(run_ts) - 1]]
+            runs = [[int(start), min(int(end) + tf_ms - 1, closed_until)] for start, end in zip(starts, ends) if start <= closed_until]
+            if runs: ranges = _merge_ranges(ranges + runs)
+            self._write(path, np.ascontiguousarray(ts, dtype=np.int64), np.ascontiguousarray(values, dtype=np.float64), ranges)
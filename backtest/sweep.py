@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .engine import execution_costs, fill_prices
+from .indicators import cached_ma
+from .metrics import METRIC_COLUMNS, performance_metrics, periods_per_year
+
+# 每批同時展開的 (組合數 x K 棒數) 元素量；批次小一點較能留在 CPU 快取內，整體反而較快
+BATCH_CELLS = 2_000_000
+
+
+def _crossover_matrix(ma_short, ma_long):
+    # 與 engine.crossover_signal 相同規則，逐列 (每列一組參數) 一次算完；
+    # 比較 s > l 等同比較 s - l > 0，NaN 在兩種寫法下都不成立
+    diff = ma_short - ma_long
+    signal = np.zeros(diff.shape, dtype=np.int8)
+    signal[:, 1:][(diff[:, 1:] > 0) & (diff[:, :-1] <= 0)] = 1
+    signal[:, 1:][(diff[:, 1:] < 0) & (diff[:, :-1] >= 0)] = -1
+    return signal
+
+
+def _long_state_matrix(signal):
+    # 持倉狀態 = 每列最近一個非零訊號為 1
+    idx = np.where(signal != 0, np.arange(signal.shape[1], dtype=np.int32), np.int32(-1))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    last = np.take_along_axis(signal, np.maximum(idx, 0), axis=1)
+    return (idx >= 0) & (last == 1)
+
+
+def _trade_layout(state, close, buy_price, sell_price):
+    # 與手續費無關、每批只算一次的部分：每筆平倉的 賣價/買價、持倉中的 close/買價，
+    # 以及每根 K 棒對應到該列最近一次平倉事件的編號 (之前沒有平倉則為 -1)
+    n = state.shape[1]
+    prev = np.zeros(state.shape, dtype=bool)
+    prev[:, 1:] = state[:, :-1]
+    idx = np.where(state & ~prev, np.arange(n, dtype=np.int32), np.int32(0))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    entry_price = buy_price[idx]
+    exits = ~state & prev
+    exit_rows, exit_cols = np.nonzero(exits)
+    exit_ratio = sell_price[exit_cols] / entry_price[exit_rows, exit_cols]
+    held_ratio = close / entry_price
+    last_exit = np.full(state.shape, -1, dtype=np.int32)
+    last_exit[exit_rows, exit_cols] = np.arange(len(exit_rows), dtype=np.int32)
+    np.maximum.accumulate(last_exit, axis=1, out=last_exit)
+    row_start = np.searchsorted(exit_rows, exit_rows, 'left')
+    return {"exit_ratio": exit_ratio, "row_start": row_start, "held_ratio": held_ratio, "last_exit": last_exit}
+
+
+def _equity_matrix(state, layout, capital, fee, size):
+    # 含成本的權益：每筆平倉時現金乘上 (1 - size) + size * (1 - fee)^2 * 賣價 / 買價，逐列連乘 (以對數累加，
+    # 只對平倉事件計算) 後前向填補即為空手時的權益；持倉中的權益 = 進場前現金 * ((1 - size) + size * (1 - fee) * close / 買價)，
+    # 與 engine.simulate 的逐筆算法等價 (僅有浮點捨入差異)
+    keep = 1 - fee
+    log_growth = np.cumsum(np.log((1 - size) + size * keep * keep * layout['exit_ratio']))
+    before_row = np.r_[0.0, log_growth][layout['row_start']]
+    cash = np.r_[capital * np.exp(log_growth - before_row), capital]
+    cash = cash[layout['last_exit']]
+    held = layout['held_ratio'] * (size * keep)
+    held += 1 - size
+    held *= cash
+    return np.where(state, held, cash)
+
+
+def backtest_matrix(close, ma_short, ma_long, capital, costs=None, open_=None, fees=None):
+    # 批次回測：ma_short / ma_long 為 (組合數, K 棒數) 矩陣，回傳每組的權益曲線、交易次數與持倉狀態。
+    # 無成本時持倉期間權益按 close 報酬連乘，與 run_strategy 的全倉進出等價 (僅有浮點捨入差異)。
+    # fees 給定時回傳 [各手續費水準的權益, ...]：交叉、持倉狀態與進場價只算一次，每多一個費率只多一次連乘
+    fee, slippage_bps, size, next_open = costs = execution_costs(costs)
+    state = _long_state_matrix(_crossover_matrix(ma_short, ma_long))
+    if next_open:
+        state[:, 1:] = state[:, :-1].copy()
+        state[:, 0] = False
+    trades = np.count_nonzero(state[:, 1:] != state[:, :-1], axis=1) + state[:, 0]
+    if fees is None and costs == execution_costs():
+        held = state[:, :-1]
+        growth = np.where(held, close[1:] / close[:-1], 1.0)
+        equity = np.empty(state.shape)
+        equity[:, 0] = capital
+        np.cumprod(growth, axis=1, out=equity[:, 1:])
+        equity[:, 1:] *= capital
+        return equity, trades, state
+    layout = _trade_layout(state, close, *fill_prices(close, open_, costs))
+    if fees is None: return _equity_matrix(state, layout, capital, fee, size), trades, state
+    return [_equity_matrix(state, layout, capital, f, size) for f in fees], trades, state
+
+
+def sweep(df, ma_types, short_windows, long_windows, capital, costs=None, fee_levels=None):
+    # 窮舉 (均線種類, 短, 長) 組合；每條均線每個資料集只算一次，交叉與權益以二維陣列批次計算。
+    # fee_levels 給定時另外窮舉手續費 (多一個 fee 欄)，各費率共用同一份交叉與持倉狀態
+    close = df['close'].to_numpy(dtype=np.float64)
+    open_ = df['open'].to_numpy(dtype=np.float64)
+    bars_per_year = periods_per_year(df['timestamp'])
+    batch = max(1, BATCH_CELLS // max(len(close), 1))
+    fees = list(fee_levels) if fee_levels is not None else [execution_costs(costs)[0]]
+    rows = []
+    for ma_type in ma_types:
+        pairs = [(s, l) for s in short_windows for l in long_windows if s < l]
+        windows = sorted({w for pair in pairs for w in pair})
+        ma = {w: cached_ma(df, w, ma_type) for w in windows}
+        for start in range(0, len(pairs), batch):
+            chunk = pairs[start:start + batch]
+            profiling.count('bars:sweep', len(chunk) * len(close) * len(fees))
+            with profiling.timer('sweep'):
+                curves, trades, state = backtest_matrix(close, np.stack([ma[s] for s, _ in chunk]), np.stack([ma[l] for _, l in chunk]), capital, costs, open_, fee_levels and fees)
+            if fee_levels is None: curves = [curves]
+            for fee, equity in zip(fees, curves):
+                # 整批策略的所有績效指標一次向量化算完
+                metrics = performance_metrics(equity, state, bars_per_year, capital)
+                final_equity = equity[:, -1]
+                rows.append(pd.DataFrame({"ma_type": ma_type, "short": [s for s, _ in chunk], "long": [l for _, l in chunk], "fee": fee, "final_equity": final_equity, "roi": (final_equity - capital) / capital * 100, "trades": trades, **metrics}))
+    columns = ["ma_type", "short", "long"] + (["fee"] if fee_levels is not None else []) + ["final_equity", "roi", "mdd", "trades"] + METRIC_COLUMNS[1:]
+    return pd.concat(rows, ignore_index=True)[columns] if rows else pd.DataFrame(columns=columns)
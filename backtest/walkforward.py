@@ -0,0 +1,119 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .engine import crossover_signal, execution_costs, simulate
+from .indicators import cached_ma
+from .metrics import calculate_mdd
+from .sweep import BATCH_CELLS, _crossover_matrix, _long_state_matrix
+
+
+def walk_forward_windows(n_bars, train_bars, test_bars, step=None, anchored=False):
+    # 產生 [(訓練起, 訓練迄, 測試起, 測試迄), ...] (左閉右開)；anchored=True 時訓練區間一律從 0 開始 (擴張視窗)
+    step = step or test_bars
+    windows = []
+    start = 0
+    while start + train_bars + test_bars <= n_bars:
+        train_end = start + train_bars
+        windows.append((0 if anchored else start, train_end, train_end, train_end + test_bars))
+        start += step
+    return windows
+
+
+def _score_batch(close_log, ma_short, ma_long, train_lo, train_hi, costs=None):
+    # 一批參數組合在「所有訓練視窗」的報酬與交易次數。
+    # 交叉訊號與持倉狀態在全序列上只算一次；視窗從空手開始，視窗內第一個非零訊號 f 之後的狀態與全序列相同，
+    # 因此視窗報酬 = 前綴和 P[迄-1] - P[f]，交易次數也由前綴和相減，每個 (組合, 視窗) 只需 O(1)。
+    # 手續費與滑價依買、賣次數加到對數報酬 (每趟來回 2·log(1-fee))；部分倉位與下一根開盤成交只在測試區間精確模擬
+    signal = _crossover_matrix(ma_short, ma_long)
+    state = _long_state_matrix(signal)
+    n = signal.shape[1]
+    log_growth = np.zeros(state.shape)
+    np.cumsum(np.where(state[:, :-1], close_log, 0.0), axis=1, out=log_growth[:, 1:])
+    changes = np.zeros(state.shape, dtype=np.int32)
+    np.cumsum(state[:, 1:] != state[:, :-1], axis=1, out=changes[:, 1:])
+    # 每根 K 棒之後 (含) 第一個非零訊號的位置，沒有則為 n
+    nxt = np.where(signal != 0, np.arange(n, dtype=np.int32), np.int32(n))
+    nxt = np.minimum.accumulate(nxt[:, ::-1], axis=1)[:, ::-1]
+
+    last = train_hi - 1
+    first = nxt[:, train_lo]
+    active = first <= last
+    first = np.minimum(first, last)
+    rows = np.arange(len(signal))[:, None]
+    growth = np.where(active, log_growth[:, last] - log_growth[rows, first], 0.0)
+    trades = np.where(active, state[rows, first] + changes[:, last] - changes[rows, first], 0)
+    fee, slippage_bps, _, _ = execution_costs(costs)
+    if fee or slippage_bps:
+        # 視窗從空手開始，買進次數 = ceil(交易次數 / 2)；期末仍持倉時以收盤計值，不扣賣出成本
+        slip = slippage_bps / 10_000
+        growth = growth + (trades + 1) // 2 * np.log((1 - fee) / (1 + slip)) + trades // 2 * np.log((1 - fee) * (1 - slip))
+    return np.expm1(growth) * 100, trades
+
+
+def _optimize(df, ma_types, short_windows, long_windows, windows, max_workers, costs=None):
+    # 回傳每個視窗的最佳 (種類, 短, 長, 訓練 ROI)；均線每條只算一次 (經指標快取)，各視窗共用
+    close = df['close'].to_numpy(dtype=np.float64)
+    close_log = np.log(close[1:] / close[:-1])
+    train_lo = np.array([w[0] for w in windows])
+    train_hi = np.array([w[1] for w in windows])
+    batch = max(1, BATCH_CELLS // max(len(close), 1))
+    tasks = []
+    for ma_type in ma_types:
+        pairs = [(s, l) for s in short_windows for l in long_windows if s < l]
+        ma = {w: cached_ma(df, w, ma_type) for w in sorted({w for pair in pairs for w in pair})}
+        for start in range(0, len(pairs), batch):
+            tasks.append((ma_type, pairs[start:start + batch], ma))
+
+    def run(task):
+        ma_type, chunk, ma = task
+        roi, trades = _score_batch(close_log, np.stack([ma[s] for s, _ in chunk]), np.stack([ma[l] for _, l in chunk]), train_lo, train_hi, costs)
+        best = np.argmax(roi, axis=0)
+        cols = np.arange(len(windows))
+        return [(roi[best[k], k], ma_type, chunk[best[k]][0], chunk[best[k]][1], int(trades[best[k], k])) for k in cols]
+
+    # numpy 的大型陣列運算會釋放 GIL，以執行緒平行處理各批參數組合
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        results = list(pool.map(run, tasks))
+    best = [max((r[k] for r in results), key=lambda item: item[0]) for k in range(len(windows))]
+    return best
+
+
+def _run_test(close, ma_short, ma_long, lo, hi, capital, costs=None, open_=None):
+    # 測試區間從空手開始；訊號以前一根 K 棒判斷交叉 (與訓練相同)，區間結束時以收盤價計值
+    lead = 1 if lo > 0 else 0
+    signal = crossover_signal(ma_short[lo - lead:hi], ma_long[lo - lead:hi])[lead:]
+    return simulate(close[lo:hi], signal, capital, costs, open_[lo:hi] if open_ is not None else None)
+
+
+def walk_forward(df, ma_types, short_windows, long_windows, capital, train_bars, test_bars, step=None, anchored=False, max_workers=None, costs=None):
+    # 滾動前進最佳化：每個訓練視窗以 ROI 選出最佳 (種類, 短, 長)，再套用到緊接著的測試視窗 (樣本外)。
+    # 均線以全部資料計算 (只用到當根以前的數據，沒有未來資訊)，各視窗共用；測試權益依序串接 (上一段期末權益為下一段本金)。
+    # costs 為成交模型 (見 engine.execution_costs)，訓練排名與測試權益都會扣除
+    # K 棒數不足以切出視窗、或沒有符合 短 < 長 的參數組合時回傳 None
+    windows = walk_forward_windows(len(df), train_bars, test_bars, step, anchored)
+    if not windows or not ma_types or not any(s < l for s in short_windows for l in long_windows): return None
+    best = _optimize(df, ma_types, short_windows, long_windows, windows, max_workers, costs)
+
+    close = df['close'].to_numpy(dtype=np.float64)
+    open_ = df['open'].to_numpy(dtype=np.float64) if execution_costs(costs)[3] else None
+    times = df['timestamp']
+    rows, segments = [], []
+    equity = capital
+    # 測試區間重疊 (step < test_bars) 時只串接尚未涵蓋的部分
+    covered = 0
+    for k, ((train_lo, train_hi, test_lo, test_hi), (train_roi, ma_type, s, l, train_trades)) in enumerate(zip(windows, best)):
+        lo = max(test_lo, covered)
+        if lo >= test_hi: continue
+        sim = _run_test(close, cached_ma(df, s, ma_type), cached_ma(df, l, ma_type), lo, test_hi, equity, costs, open_)
+        segment = sim['equity']
+        rows.append({"window": k + 1, "train_start": times.iloc[train_lo], "train_end": times.iloc[train_hi - 1], "test_start": times.iloc[lo], "test_end": times.iloc[test_hi - 1], "ma_type": ma_type, "short": s, "long": l, "train_roi": train_roi, "train_trades": train_trades, "test_roi": (segment[-1] - equity) / equity * 100, "test_trades": len(sim['buy_idx']) + len(sim['sell_idx']), "test_mdd": calculate_mdd(pd.Series(segment))})
+        segments.append(pd.DataFrame({"timestamp": times.iloc[lo:test_hi].to_numpy(), "Equity": segment}))
+        equity = segment[-1]
+        covered = test_hi
+
+    oos = pd.concat(segments, ignore_index=True)
+    oos_close = close[windows[0][2]:covered]
+    return {"final_equity": equity, "roi": (equity - capital) / capital * 100, "mdd": calculate_mdd(oos['Equity']), "bh_roi": (oos_close[-1] - oos_close[0]) / oos_close[0] * 100, "equity": oos, "windows": pd.DataFrame(rows)}
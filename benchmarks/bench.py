@@ -0,0 +1,128 @@
+# 效能基準：不啟動 Streamlit，直接匯入 backtest 套件，以合成 K 線量測各階段的時間與峰值記憶體。
+#
+#   python -m benchmarks.bench --sizes 1000 100000 1000000 --output bench.json
+#   python -m benchmarks.bench --baseline bench.json          # 與先前結果比較，變慢超過容忍倍數時回傳非 0
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from backtest import OHLCVStore, calculate_ma, calculate_mdd, indicator_cache, load_ohlcv, run_strategy
+from backtest.chart import build_price_volume_figure
+from backtest.exchanges import register_exchange
+from backtest.fake import FakeExchange
+
+START = 1_577_836_800_000
+SYMBOL = 'BTC/USDT'
+
+
+def _stages(bars, workdir):
+    # 每個階段回傳 (名稱, 可重複呼叫的函式)；資料在此先準備好，不計入量測
+    exchange = FakeExchange(id=f'bench{bars}', start=START, bars=bars, rateLimit=0.001)
+    register_exchange(exchange)
+    sources = [('Bench', exchange.id)]
+    until = START + bars * 60_000 - 1
+    frame = exchange._frame('1m')
+    df = pd.DataFrame(frame[:, 1:], columns=['open', 'high', 'low', 'close', 'volume'])
+    df.insert(0, 'timestamp', pd.to_datetime(frame[:, 0].astype(np.int64), unit='ms'))
+    res = run_strategy(df, 20, 60, 'HMA', 10000, 20)
+    equity = res['df']['Equity']
+    counter = iter(range(10 ** 9))
+
+    def fetch_cold():
+        store = OHLCVStore(f'{workdir}/cold{next(counter)}')
+        return load_ohlcv(SYMBOL, '1m', START, until, store, sources)
+
+    def run_strategy_cold():
+        # run_strategy 的均線經行程內指標快取，不清空的話重複量測只會量到快取命中
+        indicator_cache.clear()
+        return run_strategy(df, 20, 60, 'HMA', 10000, 20)
+
+    warm_store = OHLCVStore(f'{workdir}/warm')
+    load_ohlcv(SYMBOL, '1m', START, until, warm_store, sources)
+
+    return [
+        ('fetch_cold', fetch_cold),
+        ('fetch_warm', lambda: load_ohlcv(SYMBOL, '1m', START, until, warm_store, sources)),
+        ('sma_200', lambda: calculate_ma(df['close'], 200, 'SMA')),
+        ('ema_200', lambda: calculate_ma(df['close'], 200, 'EMA')),
+        ('hma_200', lambda: calculate_ma(df['close'], 200, 'HMA')),
+        ('run_strategy_hma', run_strategy_cold),
+        ('calculate_mdd', lambda: calculate_mdd(equity)),
+        ('figure', lambda: build_price_volume_figure(res['df'], res, SYMBOL, 20, 60, 20).to_json()),
+    ]
+
+
+def _measure(func, repeat):
+    # 時間取多次中最快的一次；峰值記憶體另外以 tracemalloc 量一次 (避免追蹤成本影響計時)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1024 / 1024
+
+
+def run(sizes, repeat, stages=None):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for bars in sizes:
+            for name, func in _stages(bars, workdir):
+                if stages and name not in stages: continue
+                seconds, peak_mb = _measure(func, repeat if bars < 1_000_000 else 1)
+                results.append({"stage": name, "bars": bars, "seconds": round(seconds, 6), "peak_mb": round(peak_mb, 3), "bars_per_second": round(bars / seconds) if seconds else None})
+                print(f"{name:<18} {bars:>9} bars  {seconds * 1000:>10.2f} ms  {peak_mb:>9.2f} MB", file=sys.stderr)
+    meta = {"created": datetime.now(timezone.utc).isoformat(), "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__, "machine": platform.machine(), "platform": platform.platform()}
+    return {"meta": meta, "results": results}
+
+
+def compare(current, baseline, tolerance):
+    # 找出比基準慢超過 tolerance 倍的階段
+    base = {(r['stage'], r['bars']): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        old = base.get((r['stage'], r['bars']))
+        if old and old['seconds'] and r['seconds'] > old['seconds'] * tolerance:
+            regressions.append({**r, "baseline_seconds": old['seconds'], "ratio": round(r['seconds'] / old['seconds'], 2)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="backtest 效能基準")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--stages', nargs='+', help="只跑指定階段")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="結果寫入此 JSON 檔 (預設輸出到 stdout)")
+    parser.add_argument('--baseline', help="與此 JSON 基準比較")
+    parser.add_argument('--tolerance', type=float, default=1.5, help="慢於基準多少倍視為退化")
+    args = parser.parse_args(argv)
+
+    current = run(args.sizes, args.repeat, args.stages)
+    text = json.dumps(current, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(current, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"退化: {r['stage']} @ {r['bars']} bars  {r['baseline_seconds']:.4f}s -> {r['seconds']:.4f}s (x{r['ratio']})", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from backtest.data import TokenBucket, fetch_ohlcv_range, timeframe_to_ms
+from backtest.fake import FakeExchange
+
+START = 1_577_836_800_000
+
+
+def expected_rows(exchange, timeframe, since, until):
+    frame = exchange._frame(timeframe)
+    rows = frame[(frame[:, 0] >= since) & (frame[:, 0] <= until)]
+    return [[int(row[0])] + row[1:].tolist() for row in rows]
+
+
+@pytest.mark.parametrize('timeframe', ['1m', '5m', '1h'])
+def test_one_request_per_window(timeframe):
+    # 起點不在 K 棒邊界上：每個視窗仍剛好一頁，結果連續、不重複，且視窗並行下載
+    exchange = FakeExchange(bars=200_000, latency=0.02, max_limit=300)
+    tf_ms = timeframe_to_ms(timeframe)
+    since = START + 7 * tf_ms + 12_345
+    until = since + 2_000 * tf_ms + 54_321
+    rows = fetch_ohlcv_range(exchange, 'BTC/USDT', timeframe, since, until, limit=300, max_workers=4, limiter=TokenBucket(1000, 10))
+    assert rows == expected_rows(exchange, timeframe, since, until)
+    ts = np.array([row[0] for row in rows])
+    assert ts[0] == START + 8 * tf_ms
+    assert (np.diff(ts) == tf_ms).all()
+    assert exchange.calls == -(-(until + 1 - since) // (300 * tf_ms))
+    assert exchange.max_concurrency > 1
+
+
+def test_pages_within_window_when_exchange_limit_is_smaller():
+    # limit 大於交易所單頁上限：視窗內繼續翻頁 (1000 根 = 300 + 300 + 300 + 100)
+    exchange = FakeExchange(bars=20_000, max_limit=300)
+    since = START + 30_000
+    until = since + 3_000 * 60_000 - 1
+    rows = fetch_ohlcv_range(exchange, 'BTC/USDT', '1m', since, until, limit=1000, limiter=TokenBucket(1000, 10))
+    assert rows == expected_rows(exchange, '1m', since, until)
+    assert exchange.calls == 3 * 4
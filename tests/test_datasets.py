@@ -0,0 +1,35 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import OHLCVStore, import_to_store
+from backtest.fake import FakeExchange
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def candles():
+    frame = FakeExchange(bars=3 * 1440)._frame('1h')
+    df = pd.DataFrame(frame, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+    return df
+
+
+def test_tz_aware_parquet_round_trip(tmp_path, candles):
+    # Parquet 的 timestamp[ms, tz=UTC] 讀回後為 UTC naive，匯入倉庫 (含直接 ingest 帶時區的 DataFrame) 不觸發 numpy 的時區警告
+    path = tmp_path / 'candles.parquet'
+    utc = candles.assign(timestamp=candles['timestamp'].dt.tz_localize('UTC').astype('datetime64[ms, UTC]'))
+    utc.to_parquet(path, index=False)
+    store = OHLCVStore(str(tmp_path / 'store'))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        df, timeframe = import_to_store(store, str(path), 'fake', 'BTC/USDT')
+        store.ingest('fake', 'BTC/USDT', '1h', utc)
+    assert timeframe == '1h'
+    pd.testing.assert_frame_equal(df, candles, check_dtype=False)
+    since, until = int(candles['timestamp'].iloc[0].value // 1_000_000), int(candles['timestamp'].iloc[-1].value // 1_000_000)
+    assert store.covers('fake', 'BTC/USDT', '1h', since, until)
+    pd.testing.assert_frame_equal(store.load('fake', 'BTC/USDT', '1h', since, until), candles, check_dtype=False)
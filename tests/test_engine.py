@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import run_strategy
+from backtest.fake import FakeExchange
+
+
+# --- 改寫前 app.py 的逐列迴圈 (iterrows)，作為向量化引擎的對照 ---
+def _baseline_wma(series, window):
+    weights = np.arange(1, window + 1)
+    return series.rolling(window).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+
+def _baseline_ma(series, window, ma_type):
+    if "EMA" in ma_type: return series.ewm(span=window, adjust=False).mean()
+    elif "HMA" in ma_type:
+        raw_hma = 2 * _baseline_wma(series, int(window / 2)) - _baseline_wma(series, window)
+        return _baseline_wma(raw_hma, int(np.sqrt(window)))
+    else: return series.rolling(window).mean()
+
+def baseline_run_strategy(df_input, short_w, long_w, ma_type, capital, vol_ma_len):
+    df = df_input.copy()
+    col_s, col_l = f'MA_{short_w}', f'MA_{long_w}'
+    df[col_s] = _baseline_ma(df['close'], short_w, ma_type)
+    df[col_l] = _baseline_ma(df['close'], long_w, ma_type)
+    df['Vol_MA'] = df['volume'].rolling(window=vol_ma_len).mean()
+    df['Signal'] = 0
+    df.loc[(df[col_s] > df[col_l]) & (df[col_s].shift(1) <= df[col_l].shift(1)), 'Signal'] = 1
+    df.loc[(df[col_s] < df[col_l]) & (df[col_s].shift(1) >= df[col_l].shift(1)), 'Signal'] = -1
+
+    balance, position, equity, trades = capital, 0, [], 0
+    trade_log, buy_signals, sell_signals = [], [], []
+    current_entry_price, current_entry_time = 0, None
+    for i, row in df.iterrows():
+        price, time = row['close'], row['timestamp']
+        if row['Signal'] == 1 and position == 0:
+            position = balance / price
+            balance = 0
+            trades += 1
+            current_entry_price, current_entry_time = price, time
+            buy_signals.append((time, price))
+        elif row['Signal'] == -1 and position > 0:
+            balance = position * price
+            position = 0
+            trades += 1
+            sell_signals.append((time, price))
+            pnl = (price - current_entry_price) / current_entry_price * 100
+            trade_log.append({"買入時間": current_entry_time, "買入價格": current_entry_price, "賣出時間": time, "賣出價格": price, "單筆獲利 (%)": pnl})
+        equity.append(balance + (position * price))
+    equity = pd.Series(equity)
+    mdd = ((equity - equity.cummax()) / equity.cummax()).min() * 100
+    return {"final_equity": equity.iloc[-1], "trades": trades, "mdd": mdd, "equity": equity.to_numpy(), "buys": buy_signals, "sells": sell_signals, "trade_log": pd.DataFrame(trade_log)}
+
+
+@pytest.fixture(scope='module')
+def candles():
+    frame = FakeExchange(bars=40_000)._frame('15m')
+    df = pd.DataFrame(frame, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+    return df
+
+
+@pytest.mark.parametrize('ma_type, short_w, long_w', [("SMA (簡單)", 5, 20), ("SMA (簡單)", 10, 60), ("EMA (指數)", 5, 20), ("EMA (指數)", 12, 50), ("HMA (赫爾)", 10, 60), ("HMA (赫爾)", 9, 21)])
+def test_run_strategy_matches_iterrows_loop(candles, ma_type, short_w, long_w):
+    expected = baseline_run_strategy(candles, short_w, long_w, ma_type, 10000, 20)
+    result = run_strategy(candles, short_w, long_w, ma_type, 10000, 20)
+    assert result['trades'] == expected['trades']
+    assert [t for t, _ in result['buys']] == [t for t, _ in expected['buys']]
+    assert [t for t, _ in result['sells']] == [t for t, _ in expected['sells']]
+    np.testing.assert_allclose(result['df']['Equity'].to_numpy(), expected['equity'], rtol=1e-12)
+    assert result['final_equity'] == pytest.approx(expected['final_equity'], rel=1e-12)
+    assert result['mdd'] == pytest.approx(expected['mdd'], rel=1e-9)
+    pd.testing.assert_frame_equal(result['trade_log'], expected['trade_log'], check_dtype=False, rtol=1e-12)
+
+
+def test_run_strategy_without_trades(candles):
+    # 均線視窗比資料還長：沒有任何交叉，權益維持本金
+    df = candles.iloc[:50].reset_index(drop=True)
+    expected = baseline_run_strategy(df, 20, 60, "SMA (簡單)", 10000, 20)
+    result = run_strategy(df, 20, 60, "SMA (簡單)", 10000, 20)
+    assert result['trades'] == expected['trades'] == 0
+    np.testing.assert_array_equal(result['df']['Equity'].to_numpy(), expected['equity'])
+    assert result['trade_log'].empty
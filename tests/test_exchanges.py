@@ -0,0 +1,80 @@
+import time
+
+from backtest import OHLCVStore, find_exchange, load_ohlcv
+from backtest.exchanges import register_exchange
+from backtest.fake import FakeExchange
+
+
+class BrokenExchange(FakeExchange):
+    def load_markets(self):
+        raise ConnectionError("connection refused")
+
+
+def test_load_ohlcv_reports_each_source_failure(tmp_path):
+    # 全部來源失敗時回傳各來源的原因，而非只有 "Fail"
+    register_exchange(BrokenExchange(id='fake-broken'))
+    register_exchange(FakeExchange(id='fake-nosymbol', symbols=['ETH/USDT']))
+    sources = [('Broken', 'fake-broken'), ('NoSymbol', 'fake-nosymbol')]
+    df, message = load_ohlcv('BTC/USDT', '1h', 1_577_836_800_000, 1_577_836_800_000 + 86_400_000 - 1, OHLCVStore(str(tmp_path)), sources)
+    assert df is None
+    assert message.startswith("Fail (")
+    assert "Broken: 探測失敗: ConnectionError('connection refused')" in message
+    assert "NoSymbol: 不支援此交易對或沒有資料" in message
+
+
+START = 1_577_836_800_000
+DAY = 86_400_000
+
+
+def test_falls_back_when_first_source_has_no_bars(tmp_path):
+    # 第一順位從第 100 天才有資料：第 10-20 天改用第二順位，之後重複呼叫也一樣 (不被本地倉庫卡住)
+    register_exchange(FakeExchange(id='fake-late', start=START + 100 * DAY, bars=5 * 1440))
+    register_exchange(FakeExchange(id='fake-full', start=START, bars=30 * 1440))
+    sources = [('Late', 'fake-late'), ('Full', 'fake-full')]
+    store = OHLCVStore(str(tmp_path))
+    for _ in range(2):
+        df, source = load_ohlcv('BTC/USDT', '1h', START + 10 * DAY, START + 20 * DAY - 1, store, sources)
+        assert source == 'Full' and len(df) == 240
+
+
+def test_skips_covered_source_without_bars(tmp_path):
+    # 本地倉庫已覆蓋、但該區間內一根 K 棒也沒有的來源 (交易所停機)，改讀下一個來源
+    full = FakeExchange(id='fake-outage-b', start=START, bars=30 * 1440)
+    register_exchange(full)
+    register_exchange(FakeExchange(id='fake-outage-a', start=START, bars=30 * 1440))
+    frame = full._frame('1h')
+    outage = [[int(row[0])] + row[1:].tolist() for row in frame if not START + 5 * DAY <= row[0] < START + 25 * DAY]
+    store = OHLCVStore(str(tmp_path))
+    store.load('fake-outage-a', 'BTC/USDT', '1h', START, START + 30 * DAY - 1, lambda since, until: outage)
+    sources = [('Outage', 'fake-outage-a'), ('Full', 'fake-outage-b')]
+    df, source = load_ohlcv('BTC/USDT', '1h', START + 10 * DAY, START + 20 * DAY - 1, store, sources)
+    assert source == 'Full' and len(df) == 240
+
+
+def test_probe_prefers_priority_over_speed():
+    # 較優先的來源慢一點也要等它，不被較快的備援搶走
+    register_exchange(FakeExchange(id='fake-slow-primary', bars=1440, latency=0.3))
+    register_exchange(FakeExchange(id='fake-fast-fallback', bars=1440))
+    name, exchange = find_exchange('BTC/USDT', '1h', [('Primary', 'fake-slow-primary'), ('Fallback', 'fake-fast-fallback')])
+    assert name == 'Primary' and exchange.id == 'fake-slow-primary'
+
+
+def test_probe_waits_max_not_sum():
+    # 前兩個來源都在 0.3 秒後失敗：第三個勝出，總等待約為 max(探測) 而非各探測相加
+    register_exchange(FakeExchange(id='fake-missing-1', bars=1440, latency=0.3, symbols=['ETH/USDT']))
+    register_exchange(FakeExchange(id='fake-missing-2', bars=1440, latency=0.3, symbols=['ETH/USDT']))
+    register_exchange(FakeExchange(id='fake-healthy', bars=1440, latency=0.3))
+    sources = [('Missing1', 'fake-missing-1'), ('Missing2', 'fake-missing-2'), ('Healthy', 'fake-healthy')]
+    started = time.monotonic()
+    name, _ = find_exchange('BTC/USDT', '4h', sources)
+    assert name == 'Healthy'
+    assert time.monotonic() - started < 0.8
+
+
+def test_probe_timeout_falls_to_next_source():
+    register_exchange(FakeExchange(id='fake-hanging', bars=1440, latency=1.0))
+    register_exchange(FakeExchange(id='fake-backup', bars=1440))
+    errors = {}
+    name, _ = find_exchange('BTC/USDT', '1d', [('Hanging', 'fake-hanging'), ('Backup', 'fake-backup')], timeout=0.2, errors=errors)
+    assert name == 'Backup'
+    assert errors == {}
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import calculate_hma, calculate_wma
+
+
+# --- 改寫前的 O(n·window) 版本 (rolling.apply 逐根呼叫 lambda) ---
+def baseline_wma(series, window):
+    weights = np.arange(1, window + 1)
+    return series.rolling(window).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+
+def baseline_hma(series, window):
+    half_window = int(window / 2)
+    sqrt_window = int(np.sqrt(window))
+    raw_hma = 2 * baseline_wma(series, half_window) - baseline_wma(series, window)
+    return baseline_wma(raw_hma, sqrt_window)
+
+
+def _prices(n, seed=0, nan_prefix=0):
+    rng = np.random.default_rng(seed)
+    values = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), 2)
+    values[:nan_prefix] = np.nan
+    return pd.Series(values)
+
+
+def _assert_matches(result, expected):
+    # 兩者 NaN 位置相同，其餘相對誤差 1e-11 以內 (分段累加和的捨入，見 wma_values)
+    np.testing.assert_array_equal(np.isnan(result.to_numpy()), np.isnan(expected.to_numpy()))
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-11, equal_nan=True)
+
+
+@pytest.mark.parametrize('window', [1, 2, 3, 5, 10, 21, 50, 100, 250])
+@pytest.mark.parametrize('nan_prefix', [0, 1, 7, 120])
+def test_wma_matches_rolling_apply(window, nan_prefix):
+    series = _prices(3000, seed=window, nan_prefix=nan_prefix)
+    _assert_matches(calculate_wma(series, window), baseline_wma(series, window))
+
+
+@pytest.mark.parametrize('window', [2, 4, 9, 16, 20, 55, 100])
+@pytest.mark.parametrize('nan_prefix', [0, 30])
+def test_hma_matches_rolling_apply(window, nan_prefix):
+    series = _prices(3000, seed=window, nan_prefix=nan_prefix)
+    _assert_matches(calculate_hma(series, window), baseline_hma(series, window))
+
+
+def test_wma_long_series_does_not_drift():
+    # 長序列 (價格量級大) 分段累加後仍與逐窗計算一致
+    series = _prices(200_000, seed=1) * 1000
+    _assert_matches(calculate_wma(series, 60), baseline_wma(series, 60))
+
+
+def test_wma_nan_gap_and_short_input():
+    series = _prices(500, seed=2)
+    series.iloc[200:203] = np.nan
+    _assert_matches(calculate_wma(series, 10), baseline_wma(series, 10))
+    short = _prices(5, seed=3)
+    _assert_matches(calculate_wma(short, 10), baseline_wma(short, 10))
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import LiveStrategy, ReplayFeed, run_strategy
+from backtest.fake import FakeExchange
+
+
+@pytest.fixture(scope='module')
+def candles():
+    frame = FakeExchange(bars=200_000)._frame('15m')
+    df = pd.DataFrame(frame, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+    return df
+
+
+@pytest.mark.parametrize('ma_type, short_w, long_w', [("SMA (簡單)", 5, 20), ("EMA (指數)", 3, 7), ("EMA (指數)", 12, 50), ("HMA (赫爾)", 3, 7), ("HMA (赫爾)", 10, 60)])
+def test_replay_matches_batch(candles, ma_type, short_w, long_w):
+    # 前半段暖機、後半段逐根回放，均線、訊號與權益都要與整段批次回測一致
+    half = len(candles) // 2
+    live = LiveStrategy(short_w, long_w, ma_type, 10000, 20).seed(candles.iloc[:half])
+    rows = [live.update(pd.Timestamp(candle[0], unit='ms'), candle[4], candle[5]) for candle in ReplayFeed(candles.iloc[half:], '15m')]
+    expected = run_strategy(candles, short_w, long_w, ma_type, 10000, 20)['df'].iloc[half:]
+    replay = pd.DataFrame(rows)
+    np.testing.assert_array_equal(replay[f'MA_{short_w}'].to_numpy(), expected[f'MA_{short_w}'].to_numpy())
+    np.testing.assert_array_equal(replay[f'MA_{long_w}'].to_numpy(), expected[f'MA_{long_w}'].to_numpy())
+    np.testing.assert_array_equal(replay['Signal'].to_numpy(), expected['Signal'].to_numpy())
+    np.testing.assert_allclose(replay['Equity'].to_numpy(), expected['Equity'].to_numpy(), rtol=1e-12)
+    assert live.equity == pytest.approx(expected['Equity'].iloc[-1], rel=1e-12)
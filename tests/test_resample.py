@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import OHLCVStore, load_ohlcv, load_resampled, resample_ohlcv
+from backtest.exchanges import register_exchange
+from backtest.fake import FakeExchange
+
+TIMEFRAMES = ['15m', '1h', '4h', '1d', '1w']
+
+
+def _frame(rows):
+    df = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+    return df
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    # 起點不在整點/週一，頭尾都有不完整的區間
+    exchange = FakeExchange(id='fake-resample', start=1_577_836_800_000 + 37 * 60_000, bars=60 * 1440 + 11)
+    register_exchange(exchange)
+    return exchange
+
+
+@pytest.mark.parametrize('base', ['1m', '15m'])
+@pytest.mark.parametrize('timeframe', TIMEFRAMES)
+def test_resample_matches_native_bars(exchange, base, timeframe):
+    native = _frame(exchange._frame(timeframe))
+    result = resample_ohlcv(_frame(exchange._frame(base)), timeframe)
+    pd.testing.assert_frame_equal(result, native, check_exact=False, rtol=1e-12)
+
+
+# pandas 的區間切法 (左閉、以左端標記)，與 FakeExchange/resample_ohlcv 的對齊邏輯無關
+# 週線以 W-MON 錨定週一；其餘為固定長度、從 epoch 起算
+PANDAS_RULES = {'15m': '15min', '1h': '1h', '4h': '4h', '1d': '24h', '1w': 'W-MON'}
+
+
+@pytest.mark.parametrize('timeframe', TIMEFRAMES)
+def test_resample_matches_pandas_resample(exchange, timeframe):
+    base = _frame(exchange._frame('1m'))
+    origin = {} if timeframe == '1w' else {'origin': 'epoch'}
+    grouped = base.set_index('timestamp').resample(PANDAS_RULES[timeframe], closed='left', label='left', **origin)
+    expected = grouped.agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}).dropna(subset=['open']).reset_index()
+    expected['timestamp'] = expected['timestamp'].astype('datetime64[ms]')
+    pd.testing.assert_frame_equal(resample_ohlcv(base, timeframe), expected, check_exact=False, rtol=1e-12)
+
+
+def test_resample_bucket_opens():
+    # 2020-01-01 (週三) 00:37 起的 K 線：各週期第一根的開盤時間 (UTC)
+    df = _frame([[1_577_836_800_000 + 37 * 60_000 + i * 60_000, 1, 1, 1, 1, 1] for i in range(3)])
+    opens = {tf: resample_ohlcv(df, tf)['timestamp'].iloc[0] for tf in TIMEFRAMES}
+    assert opens == {'15m': pd.Timestamp('2020-01-01 00:30'), '1h': pd.Timestamp('2020-01-01 00:00'), '4h': pd.Timestamp('2020-01-01 00:00'),
+                     '1d': pd.Timestamp('2020-01-01 00:00'), '1w': pd.Timestamp('2019-12-30 00:00')}
+
+
+@pytest.mark.parametrize('timeframe', TIMEFRAMES)
+def test_load_resampled_matches_native_download(exchange, tmp_path, timeframe):
+    sources = [('Fake', exchange.id)]
+    since = 1_577_836_800_000 + 3 * 86_400_000
+    until = since + 40 * 86_400_000 - 1
+    native, _ = load_ohlcv('BTC/USDT', timeframe, since, until, OHLCVStore(str(tmp_path / 'native')), sources)
+    result, _ = load_resampled('BTC/USDT', timeframe, since, until, OHLCVStore(str(tmp_path / 'base')), '15m', span_timeframe='1w', sources=sources)
+    pd.testing.assert_frame_equal(result, native, check_exact=False, rtol=1e-12)
+
+
+def test_switching_timeframes_reuses_base_download(exchange, tmp_path):
+    # 基礎週期下載一次後，切換其他週期不再連線
+    sources = [('Fake', exchange.id)]
+    store = OHLCVStore(str(tmp_path))
+    since = 1_577_836_800_000 + 5 * 86_400_000
+    until = since + 20 * 86_400_000 - 1
+    load_resampled('BTC/USDT', '15m', since, until, store, '15m', span_timeframe='1w', sources=sources)
+    calls = exchange.calls
+    for timeframe in TIMEFRAMES[1:]:
+        df, _ = load_resampled('BTC/USDT', timeframe, since, until, store, '15m', span_timeframe='1w', sources=sources)
+        assert df is not None and not df.empty
+    assert exchange.calls == calls
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import run_strategy
+from backtest.engine import EXIT_REASONS, crossover_signal
+from backtest.fake import FakeExchange
+
+
+# --- 逐根狀態機 (進出場條件 + 成交模型)，作為 rule_signal / simulate 向量化版本的對照 ---
+def baseline_rules(close, open_, volume, vol_ma, signal, rules, costs, capital):
+    volume_k, stop_loss, take_profit, trailing = (rules.get(k, 0.0) for k in ('volume_k', 'stop_loss', 'take_profit', 'trailing'))
+    fee, slip, size, next_open = costs.get('fee', 0.0), costs.get('slippage_bps', 0.0) / 10_000, costs.get('size', 1.0), costs.get('next_open', False)
+    price = open_ if next_open else close
+    n = len(close)
+    # 1. 訊號：多頭區段內第一根通過成交量過濾的 K 棒進場；死亡交叉或停損/停利/移動停損出場，提前出場後等下一次黃金交叉
+    orders, reasons = np.zeros(n, dtype=np.int64), []
+    up = used = holding = False
+    ref = peak = 0.0
+    for i in range(n):
+        was_up = up
+        if signal[i]: up = signal[i] == 1
+        if up and not was_up: used = False
+        if holding:
+            code = 0 if up else -1
+            if up:
+                peak = max(peak, close[i])
+                if take_profit and close[i] >= ref * (1 + take_profit): code = 2
+                if trailing and close[i] <= peak * (1 - trailing): code = 3
+                if stop_loss and close[i] <= ref * (1 - stop_loss): code = 1
+            if code:
+                orders[i], holding = -1, False
+                reasons.append(max(code, 0))
+        elif up and not used and (not volume_k or volume[i] > volume_k * vol_ma[i]):
+            orders[i], used, holding = 1, True, True
+            fill = price[min(i + next_open, n - 1)]
+            ref = peak = fill * (1 + slip) if slip else fill
+    # 2. 成交：收盤或下一根開盤，買進價加滑價、賣出價減滑價，雙邊扣手續費
+    cash, units, long_, equity = capital, 0.0, False, np.empty(n)
+    for i in range(n):
+        order = (orders[i - 1] if i else 0) if next_open else orders[i]
+        if order == 1 and not long_:
+            buy_px = price[i] * (1 + slip) if slip else price[i]
+            units, cash, long_ = cash * size * (1 - fee) / buy_px, cash * (1 - size), True
+        elif order == -1 and long_:
+            sell_px = price[i] * (1 - slip) if slip else price[i]
+            cash, units, long_ = cash + units * sell_px * (1 - fee), 0.0, False
+        equity[i] = cash + units * close[i]
+    return equity, reasons
+
+
+@pytest.fixture(scope='module')
+def candles():
+    frame = FakeExchange(bars=40_000)._frame('15m')
+    df = pd.DataFrame(frame, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+    return df
+
+
+RULES = [
+    {'volume_k': 1.2},
+    {'stop_loss': 0.01},
+    {'take_profit': 0.015},
+    {'trailing': 0.008},
+    {'volume_k': 0.8, 'stop_loss': 0.01, 'take_profit': 0.02, 'trailing': 0.006},
+]
+
+
+@pytest.mark.parametrize('rules', RULES)
+@pytest.mark.parametrize('next_open', [False, True])
+@pytest.mark.parametrize('slippage_bps', [0, 5])
+def test_rules_match_per_bar_loop(candles, rules, next_open, slippage_bps):
+    costs = {'fee': 0.001, 'slippage_bps': slippage_bps, 'size': 0.9, 'next_open': next_open}
+    result = run_strategy(candles, 10, 40, "SMA (簡單)", 10000, 20, costs, rules)
+    df = result['df']
+    signal = crossover_signal(df['MA_10'].to_numpy(), df['MA_40'].to_numpy())
+    equity, reasons = baseline_rules(candles['close'].to_numpy(), candles['open'].to_numpy(), candles['volume'].to_numpy(), df['Vol_MA'].to_numpy(), signal, rules, costs, 10000)
+    np.testing.assert_allclose(df['Equity'].to_numpy(), equity, rtol=1e-12)
+    trade_log = result['trade_log']
+    assert len(trade_log) >= 10
+    assert trade_log['出場原因'].tolist() == EXIT_REASONS[reasons[:len(trade_log)]].tolist()
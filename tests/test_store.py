@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backtest import OHLCVStore
+from backtest.fake import FakeExchange
+
+START = 1_577_836_800_000
+HOUR = 3_600_000
+DAY = 86_400_000
+
+
+class Recorder:
+    # 直接切 FakeExchange 的 1h K 線，記錄每次補抓的缺口；first_bar 之前視為交易所沒有資料
+    def __init__(self, first_bar=None):
+        self.frame = FakeExchange(bars=30 * 1440)._frame('1h')
+        self.first_bar = first_bar
+        self.gaps = []
+        self._lock = threading.Lock()
+
+    def __call__(self, since, until):
+        with self._lock:
+            self.gaps.append((since, until))
+        lo = np.searchsorted(self.frame[:, 0], max(since, self.first_bar or since), 'left')
+        hi = np.searchsorted(self.frame[:, 0], until, 'right')
+        return [[int(row[0])] + row[1:].tolist() for row in self.frame[lo:hi]]
+
+    def expected(self, since, until):
+        rows = self(since, until)
+        df = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+        return df
+
+
+def test_fills_only_head_and_tail_gaps(tmp_path):
+    store, fetch = OHLCVStore(str(tmp_path)), Recorder()
+    store.load('fake', 'BTC/USDT', '1h', START + 5 * DAY, START + 10 * DAY - 1, fetch)
+    fetch.gaps.clear()
+    df = store.load('fake', 'BTC/USDT', '1h', START + 3 * DAY, START + 12 * DAY - 1, fetch)
+    assert fetch.gaps == [(START + 3 * DAY, START + 5 * DAY - 1), (START + 10 * DAY, START + 12 * DAY - 1)]
+    pd.testing.assert_frame_equal(df, fetch.expected(START + 3 * DAY, START + 12 * DAY - 1))
+
+
+def test_repeat_load_does_not_fetch(tmp_path):
+    fetch = Recorder()
+    OHLCVStore(str(tmp_path)).load('fake', 'BTC/USDT', '1h', START, START + 7 * DAY - 1, fetch)
+    fetch.gaps.clear()
+    # 新的實例 (Streamlit 每次 rerun) 讀同一個目錄
+    store = OHLCVStore(str(tmp_path))
+    assert store.covers('fake', 'BTC/USDT', '1h', START + DAY, START + 2 * DAY)
+    df = store.load('fake', 'BTC/USDT', '1h', START + DAY, START + 6 * DAY - 1, fetch)
+    assert fetch.gaps == []
+    assert len(df) == 5 * 24
+
+
+def test_empty_gap_is_not_marked_covered(tmp_path):
+    # 交易所從第 10 天才有資料：之前的區段不記為已覆蓋，之後仍會再問一次
+    store, fetch = OHLCVStore(str(tmp_path)), Recorder(first_bar=START + 10 * DAY)
+    assert store.load('fake', 'BTC/USDT', '1h', START + 2 * DAY, START + 5 * DAY - 1, fetch).empty
+    assert not store.covers('fake', 'BTC/USDT', '1h', START + 2 * DAY, START + 5 * DAY - 1)
+    df = store.load('fake', 'BTC/USDT', '1h', START + 8 * DAY, START + 12 * DAY - 1, fetch)
+    assert df['timestamp'].iloc[0] == pd.Timestamp(START + 10 * DAY, unit='ms')
+    assert store.covers('fake', 'BTC/USDT', '1h', START + 10 * DAY, START + 12 * DAY - 1)
+    assert not store.covers('fake', 'BTC/USDT', '1h', START + 8 * DAY, START + 12 * DAY - 1)
+
+
+def test_concurrent_writers(tmp_path):
+    # 多個執行緒、各自的實例同時補抓重疊區間，結果完整且不重複
+    fetch, errors = Recorder(), []
+
+    def worker(k):
+        try:
+            OHLCVStore(str(tmp_path)).load('fake', 'BTC/USDT', '1h', START + k * DAY, START + (k + 6) * DAY - 1, fetch)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert errors == []
+    df = OHLCVStore(str(tmp_path)).load('fake', 'BTC/USDT', '1h', START, START + 13 * DAY - 1)
+    pd.testing.assert_frame_equal(df, fetch.expected(START, START + 13 * DAY - 1))
+    # 只留下最新一版的兩個陣列檔
+    assert len(list((tmp_path / 'fake' / 'BTC-USDT' / '1h').glob('*.npy'))) == 2
+
+
+def test_ingest_marks_only_contiguous_runs(tmp_path):
+    # 匯入的檔案中間缺一段：只有兩端連續的區段記為已覆蓋，缺口之後仍會向交易所補抓
+    store, fetch = OHLCVStore(str(tmp_path)), Recorder()
+    df = fetch.expected(START, START + 10 * DAY - 1)
+    held = df[(df['timestamp'] < pd.Timestamp(START + 4 * DAY, unit='ms')) | (df['timestamp'] >= pd.Timestamp(START + 6 * DAY, unit='ms'))]
+    store.ingest('fake', 'BTC/USDT', '1h', held)
+    fetch.gaps.clear()
+    assert store.covers('fake', 'BTC/USDT', '1h', START, START + 4 * DAY - 1)
+    assert store.covers('fake', 'BTC/USDT', '1h', START + 6 * DAY, START + 10 * DAY - 1)
+    assert not store.covers('fake', 'BTC/USDT', '1h', START, START + 10 * DAY - 1)
+    df_loaded = store.load('fake', 'BTC/USDT', '1h', START, START + 10 * DAY - 1, fetch)
+    assert fetch.gaps == [(START + 4 * DAY, START + 6 * DAY - 1)]
+    pd.testing.assert_frame_equal(df_loaded, df)
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import calculate_ma, walk_forward
+from backtest.fake import FakeExchange
+from backtest.walkforward import _run_test, _score_batch, walk_forward_windows
+
+
+@pytest.fixture(scope='module')
+def candles():
+    frame = FakeExchange(bars=200_000)._frame('15m')
+    df = pd.DataFrame(frame, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+    return df
+
+
+@pytest.mark.parametrize('costs', [None, {'fee': 0.001}, {'fee': 0.0005, 'slippage_bps': 3}])
+def test_training_score_matches_simulate(candles, costs):
+    # 訓練排名用的 O(1) 視窗報酬 (含手續費、滑價) 與逐筆模擬的 ROI 相同
+    close = candles['close'].to_numpy()
+    pairs = [(5, 20), (10, 30), (8, 60)]
+    ma_s = np.stack([calculate_ma(candles['close'], s, 'SMA').to_numpy() for s, _ in pairs])
+    ma_l = np.stack([calculate_ma(candles['close'], l, 'SMA').to_numpy() for _, l in pairs])
+    windows = walk_forward_windows(len(close), 600, 200)
+    lo, hi = np.array([w[0] for w in windows]), np.array([w[1] for w in windows])
+    roi, trades = _score_batch(np.log(close[1:] / close[:-1]), ma_s, ma_l, lo, hi, costs)
+    for row in range(len(pairs)):
+        for k, (train_lo, train_hi, _, _) in enumerate(windows):
+            sim = _run_test(close, ma_s[row], ma_l[row], train_lo, train_hi, 10000, costs)
+            assert trades[row, k] == len(sim['buy_idx']) + len(sim['sell_idx'])
+            assert roi[row, k] == pytest.approx((sim['equity'][-1] - 10000) / 100, rel=1e-9, abs=1e-9)
+
+
+def test_costs_lower_out_of_sample_equity(candles):
+    args = (candles, ["SMA"], [5, 10], [20, 40], 10000, 2000, 1000)
+    free, costly = walk_forward(*args), walk_forward(*args, costs={'fee': 0.001})
+    assert costly['final_equity'] < free['final_equity']
+    assert (costly['windows']['train_roi'] <= free['windows']['train_roi'] + 1e-9).all()